@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Hot backups and compaction for the apps' SQLite databases.
+
+backup   Copy each database with SQLite's online backup API, a few hundred
+         pages per step so no lock is held for long (a write by the apps
+         restarts a stepped copy, which then finishes in one step),
+         compact the copy with VACUUM INTO, gzip it into BACKUP_DIR/<app>/
+         and keep the newest BACKUP_KEEP per database.
+compact  Checkpoint and truncate each live database's WAL, and give back
+         free pages once they pass COMPACT_FREE_RATIO of the file, in small
+         incremental_vacuum transactions between the apps' writes
+         (common/db.py switches every database to incremental auto_vacuum).
+verify   Unpack snapshots (the newest per database, or --all) and run
+         PRAGMA integrity_check on each.
+run      Back up, verify and compact every BACKUP_INTERVAL seconds.
+
+    python common/backup.py backup|compact|verify [--all]|run [--db PATH ...]
+"""
+
+import argparse
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+import apsw
+
+ROOT = Path(__file__).resolve().parent.parent
+# Each app keeps its database in its own directory
+DATABASES = [ROOT / 'notes' / 'notes.db', ROOT / 'menu' / 'menu.db', ROOT / 'radio' / 'radio.db']
+BACKUP_DIR = Path(os.environ.get('LALTEN_BACKUP_DIR', ROOT / 'backups'))
+BACKUP_KEEP = int(os.environ.get('LALTEN_BACKUP_KEEP', 14))
+BACKUP_INTERVAL = float(os.environ.get('LALTEN_BACKUP_INTERVAL', 86400))
+# Pages copied per backup step, and the pause between steps that lets
+# the apps' writers in
+STEP_PAGES = int(os.environ.get('LALTEN_BACKUP_STEP_PAGES', 256))
+STEP_PAUSE = float(os.environ.get('LALTEN_BACKUP_STEP_PAUSE', 0.005))
+COMPACT_FREE_RATIO = float(os.environ.get('LALTEN_COMPACT_FREE_RATIO', 0.2))
+# Pages freed per incremental_vacuum transaction
+VACUUM_PAGES = 512
+BUSY_TIMEOUT = 5000
+
+def connect(path, readonly=False):
+    flags = apsw.SQLITE_OPEN_READONLY if readonly else apsw.SQLITE_OPEN_READWRITE
+    conn = apsw.Connection(str(path), flags=flags)
+    conn.pragma('busy_timeout', BUSY_TIMEOUT)
+    return conn
+
+def snapshot_dir(db_path):
+    return BACKUP_DIR / Path(db_path).resolve().parent.name
+
+def snapshots(db_path):
+    """Snapshots of `db_path`, oldest first."""
+    stem = Path(db_path).stem
+    return sorted(snapshot_dir(db_path).glob(f'{stem}-*.db.gz'))
+
+def copy_online(source, dest_path):
+    """Copy the open database `source` to a new file at dest_path, in steps."""
+    dest = apsw.Connection(str(dest_path))
+    with dest.backup('main', source, 'main') as backup:
+        backup.step(STEP_PAGES)
+        while not backup.done:
+            remaining = backup.remaining
+            time.sleep(STEP_PAUSE)
+            backup.step(STEP_PAGES)
+            if not backup.done and backup.remaining >= remaining:
+                # A write from another connection restarted the copy, and a
+                # busy app would keep doing so. Finish in one step: in WAL
+                # mode its read transaction does not block writers.
+                backup.step(-1)
+    dest.close()
+
+def backup(db_path):
+    """Snapshot db_path into BACKUP_DIR, compacted and gzipped; returns its path."""
+    db_path = Path(db_path)
+    out_dir = snapshot_dir(db_path)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    # Microseconds, so two backups in one second do not replace each other
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+    target = out_dir / f'{db_path.stem}-{stamp}.db.gz'
+    with tempfile.TemporaryDirectory(dir=out_dir, prefix='.backup-') as work:
+        copy = Path(work) / 'copy.db'
+        compacted = Path(work) / 'compacted.db'
+        source = connect(db_path, readonly=True)
+        try:
+            copy_online(source, copy)
+        finally:
+            source.close()
+        # Compact the copy, never the live file: VACUUM INTO rewrites it
+        # without free pages or WAL, as a single self-contained file
+        conn = apsw.Connection(str(copy))
+        conn.execute('VACUUM INTO ?', (str(compacted),))
+        conn.close()
+        partial = Path(work) / 'snapshot.db.gz'
+        with open(compacted, 'rb') as src, gzip.open(partial, 'wb') as out:
+            shutil.copyfileobj(src, out, 1 << 20)
+        os.replace(partial, target)
+    for old in snapshots(db_path)[:-BACKUP_KEEP]:
+        old.unlink()
+    return target
+
+def verify(snapshot):
+    """PRAGMA integrity_check on an unpacked copy of `snapshot`; returns its messages."""
+    with tempfile.TemporaryDirectory(prefix='verify-') as work:
+        path = Path(work) / 'snapshot.db'
+        with gzip.open(snapshot, 'rb') as src, open(path, 'wb') as out:
+            shutil.copyfileobj(src, out, 1 << 20)
+        conn = connect(path, readonly=True)
+        try:
+            return [row[0] for row in conn.execute('PRAGMA integrity_check')]
+        finally:
+            conn.close()
+
+def compact(db_path):
+    """
+    Truncate the WAL and, past COMPACT_FREE_RATIO free pages, shrink the file.
+    Returns (pages before, pages after).
+    """
+    conn = connect(db_path)
+    try:
+        conn.wal_checkpoint(mode=apsw.SQLITE_CHECKPOINT_TRUNCATE)
+        pages, free = conn.pragma('page_count'), conn.pragma('freelist_count')
+        # Without incremental auto_vacuum (a database no app has opened since
+        # the switch) there is nothing to free short of a blocking VACUUM
+        if pages and free / pages >= COMPACT_FREE_RATIO and conn.pragma('auto_vacuum') == 2:
+            # Each call is its own short write transaction
+            while conn.pragma('freelist_count'):
+                conn.execute(f'PRAGMA incremental_vacuum({VACUUM_PAGES})').fetchall()
+                time.sleep(STEP_PAUSE)
+            conn.wal_checkpoint(mode=apsw.SQLITE_CHECKPOINT_TRUNCATE)
+        return pages, conn.pragma('page_count')
+    finally:
+        conn.close()
+
+def run_backups(paths):
+    failed = False
+    for path in paths:
+        try:
+            target = backup(path)
+            problems = [m for m in verify(target) if m != 'ok']
+            if problems:
+                failed = True
+                print(f"{target}: integrity_check failed: {'; '.join(problems[:5])}")
+            else:
+                print(f"{path} -> {target} ({target.stat().st_size / 1024:.0f} KiB)")
+        except (apsw.Error, OSError) as e:
+            failed = True
+            print(f"Backup of {path} failed: {e}")
+    return failed
+
+def run_compaction(paths):
+    failed = False
+    for path in paths:
+        try:
+            before, after = compact(path)
+            print(f"{path}: {before} -> {after} pages")
+        except apsw.Error as e:
+            failed = True
+            print(f"Compaction of {path} failed: {e}")
+    return failed
+
+def run_verify(paths, everything):
+    failed = False
+    for path in paths:
+        found = snapshots(path)
+        if not found:
+            print(f"{path}: no snapshots in {snapshot_dir(path)}")
+            continue
+        for snapshot in found if everything else found[-1:]:
+            try:
+                messages = verify(snapshot)
+            except (apsw.Error, OSError, EOFError) as e:
+                messages = [str(e)]
+            ok = messages == ['ok']
+            failed = failed or not ok
+            print(f"{snapshot}: {'ok' if ok else '; '.join(messages[:5])}")
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description='Back up, compact and verify the app databases.')
+    parser.add_argument('command', choices=('backup', 'compact', 'verify', 'run'))
+    parser.add_argument('--db', action='append', type=Path, help='database file (default: every app)')
+    parser.add_argument('--all', action='store_true', help='verify every snapshot, not just the newest')
+    args = parser.parse_args()
+    # Apps that have not created their database yet have nothing to back up
+    paths = args.db or [path for path in DATABASES if path.exists()]
+
+    if args.command == 'backup':
+        sys.exit(run_backups(paths))
+    if args.command == 'compact':
+        sys.exit(run_compaction(paths))
+    if args.command == 'verify':
+        sys.exit(run_verify(paths, args.all))
+    while True:
+        run_backups(paths)
+        run_compaction(paths)
+        time.sleep(BACKUP_INTERVAL)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Read and write latency under concurrent requests: fastlite's default
+single shared connection against common/db.py's connection per thread,
+with and without its pragmas.
+
+Each config gets a fresh notes-like database in a temp directory, seeded
+with --rows rows. --threads threads (standing in for the threadpool that
+runs sync FastHTML routes) then loop for --seconds, pausing a random
+--think ms between requests so the CPU is not simply saturated: mostly
+listing-page reads, and --write-share single-row inserts and updates, each its own
+transaction as in the apps. Operations that raise (a thread finding the
+shared connection busy, SQLITE_BUSY without a busy timeout) are counted
+as errors.
+
+    python bench_db.py [--rows 100000] [--threads 8] [--seconds 5] [--write-share 0.2] [--think 1]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import apsw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastlite import database
+from common.db import PRAGMAS, Database
+
+def percentile(times, q):
+    return times[min(int(len(times) * q), len(times) - 1)] * 1000 if times else float('nan')
+
+def seed(db, rows):
+    db.execute('CREATE TABLE notes (id INTEGER PRIMARY KEY, content TEXT, created_at TEXT, status TEXT)')
+    db.execute('CREATE INDEX idx_notes_status_id ON notes (status, id)')
+    rng = random.Random(0)
+    with db.conn:
+        db.conn.executemany('INSERT INTO notes (content, created_at, status) VALUES (?, ?, ?)',
+                            [(f'item {i} ' + 'x' * rng.randint(10, 200), '2024-01-01',
+                              'archived' if rng.random() < 0.9 else 'active') for i in range(rows)])
+
+def worker(db, args, deadline, reads, writes, errors, index):
+    rng = random.Random(index)
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            operation(db, args, rng, start, reads, writes)
+        except apsw.Error:
+            errors.append(time.perf_counter() - start)
+        time.sleep(rng.expovariate(1000 / args.think) if args.think else 0)
+
+def operation(db, args, rng, start, reads, writes):
+    if rng.random() < args.write_share:
+        if rng.random() < 0.5:
+            db.execute('INSERT INTO notes (content, created_at, status) VALUES (?, ?, ?)',
+                       ['bench write', '2024-01-01', 'active'])
+        else:
+            db.execute('UPDATE notes SET status = ? WHERE id = ?',
+                       [rng.choice(('active', 'archived')), rng.randint(1, args.rows)])
+        writes.append(time.perf_counter() - start)
+    else:
+        status = rng.choice(('active', 'archived'))
+        before = rng.randint(args.rows // 2, args.rows)
+        db.execute('SELECT * FROM notes WHERE status = ? AND id < ? ORDER BY id DESC LIMIT 51',
+                   [status, before]).fetchall()
+        reads.append(time.perf_counter() - start)
+
+def run(label, open_fn, args):
+    directory = tempfile.mkdtemp(prefix='db-bench-')
+    db = open_fn(os.path.join(directory, 'bench.db'))
+    seed(db, args.rows)
+    reads, writes, errors = [], [], []
+    deadline = time.perf_counter() + args.seconds
+    threads = [threading.Thread(target=worker, args=(db, args, deadline, reads, writes, errors, i))
+               for i in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    reads.sort()
+    writes.sort()
+    print(f"{label:28} | {(len(reads) + len(writes)) / args.seconds:7.0f} | "
+          f"{percentile(reads, 0.5):5.2f} / {percentile(reads, 0.99):6.2f} | "
+          f"{percentile(writes, 0.5):5.2f} / {percentile(writes, 0.99):6.2f} | {len(errors):6}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SQLite connection settings under concurrency.')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--write-share', type=float, default=0.2)
+    parser.add_argument('--think', type=float, default=1.0, help='mean pause between requests per thread (ms)')
+    args = parser.parse_args()
+
+    configs = [
+        ("fastlite, shared connection", lambda path: database(path)),
+        ("per thread, fastlite pragmas", lambda path: Database(path, {'journal_mode': 'wal'})),
+        ("per thread, + busy_timeout", lambda path: Database(path, {'journal_mode': 'wal', 'busy_timeout': 5000})),
+        ("per thread, PRAGMAS", lambda path: Database(path)),
+        ("PRAGMAS, synchronous=full", lambda path: Database(path, {**PRAGMAS, 'synchronous': 'full'})),
+    ]
+    print(f"{args.rows} rows, {args.threads} threads, {args.seconds:g} s each, "
+          f"{args.write_share:.0%} writes, {args.think:g} ms think time; latencies in ms as p50 / p99")
+    print(f"{'config':28} | {'ops/s':>7} | {'read':>14} | {'write':>14} | errors")
+    for label, open_fn in configs:
+        run(label, open_fn, args)
+
+if __name__ == '__main__':
+    main()
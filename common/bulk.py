@@ -0,0 +1,207 @@
+"""
+Bulk import and export for the notes and menu apps.
+
+Imports take newline-separated text (one item per line), CSV with a
+header row naming the columns, or JSON: {"items": [...]} or a bare array,
+with strings or objects as items. The import route is a plain Starlette
+one (add_import_route), so the body is read here, at most MAX_IMPORT_BYTES
+of it, instead of being parsed whole by FastHTML first.
+The rows are parsed lazily and handed to one executemany in a single
+transaction, so a paste of a whole list costs one request and one
+commit, and an invalid row rolls back the whole import.
+
+Exports stream a table as CSV or JSON in EXPORT_CHUNK-row pages by id.
+Only one page of rows is in memory at a time, and no read transaction is
+held open between pages, so writers, checkpoints and backups carry on.
+Rows written while an export runs may or may not appear in it.
+"""
+
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+from fasthtml.common import A, Button, Details, Form, P, Request, StreamingResponse, Summary, Textarea
+from common.offline import utc_now
+
+# Largest import body accepted
+MAX_IMPORT_BYTES = 32 * 2**20
+# Rows fetched and written per export page
+EXPORT_CHUNK = 1000
+# Import formats by Content-Type, when no ?format= is given
+CONTENT_TYPES = {'text/csv': 'csv', 'application/json': 'json', 'text/plain': 'text'}
+FORMATS = ('text', 'csv', 'json')
+
+class BadImport(ValueError):
+    """An import that cannot be read; nothing of it was stored."""
+
+def is_form(req):
+    """Whether the request is a form post (the page) rather than a raw body (the API)."""
+    return req.headers.get('content-type', '').split(';')[0].strip() in (
+        'application/x-www-form-urlencoded', 'multipart/form-data')
+
+async def read_body(req):
+    """The request body, refused (BadImport) once it passes MAX_IMPORT_BYTES."""
+    too_large = BadImport(f'import larger than {MAX_IMPORT_BYTES // 2**20} MiB')
+    try:
+        length = int(req.headers.get('content-length') or 0)
+    except ValueError:
+        raise BadImport('invalid Content-Length')
+    if length > MAX_IMPORT_BYTES:
+        raise too_large
+    body = bytearray()
+    async for chunk in req.stream():
+        body += chunk
+        if len(body) > MAX_IMPORT_BYTES:
+            raise too_large
+    return bytes(body)
+
+async def read_import(req):
+    """
+    (format, text) of an import request: the `text` field (and optional
+    `format`) of a form post, or a raw body whose format comes from
+    ?format= or its Content-Type.
+    """
+    content_type = req.headers.get('content-type', '').split(';')[0].strip()
+    body = await read_body(req)
+    if is_form(req):
+        async def replay():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        form = await Request(req.scope, replay).form()
+        fmt, text = form.get('format') or 'text', form.get('text') or ''
+    else:
+        fmt = req.query_params.get('format') or CONTENT_TYPES.get(content_type, 'text')
+        try:
+            text = body.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise BadImport('import is not UTF-8')
+    if fmt not in FORMATS:
+        raise BadImport(f"unknown format {fmt!r}; use one of {', '.join(FORMATS)}")
+    return fmt, text
+
+def parse_rows(fmt, text, fields):
+    """
+    The rows of an import as dicts of `fields` (column -> allowed values, or
+    None for any text); `content` is required. Blank text lines are skipped.
+    """
+    if fmt == 'text':
+        records = ({'content': line} for line in text.splitlines() if line.strip())
+    elif fmt == 'csv':
+        reader = csv.DictReader(io.StringIO(text))
+        if 'content' not in (reader.fieldnames or ()):
+            raise BadImport('CSV needs a header row with a content column')
+        records = reader
+    else:
+        try:
+            records = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise BadImport(f'invalid JSON: {e}')
+        if isinstance(records, dict):
+            records = records.get('items')
+        if not isinstance(records, list):
+            raise BadImport('JSON import must be {"items": [...]} or an array')
+    for number, record in enumerate(records, 1):
+        if isinstance(record, str):
+            record = {'content': record}
+        if not isinstance(record, dict):
+            raise BadImport(f'row {number}: expected a string or an object')
+        row = {name: record[name].strip() for name in fields if isinstance(record.get(name), str) and record[name].strip()}
+        if 'content' not in row:
+            raise BadImport(f'row {number}: no content')
+        for name, value in row.items():
+            if fields[name] is not None and value not in fields[name]:
+                raise BadImport(f"row {number}: {name} must be one of {', '.join(fields[name])}")
+        yield row
+
+def import_rows(db, table, rows, fields, defaults=None):
+    """
+    Insert `rows` (from parse_rows) with one executemany in one transaction;
+    returns how many. Columns a row leaves out get `defaults`, else NULL.
+    """
+    defaults = defaults or {}
+    created_at, updated_at = datetime.now().isoformat(), utc_now()
+    columns = list(fields)
+    count = 0
+
+    def values():
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield [row.get(name, defaults.get(name)) for name in columns] + [created_at, updated_at]
+
+    sql = (f"INSERT INTO {table} ({', '.join(columns)}, created_at, updated_at) "
+           f"VALUES ({', '.join('?' * (len(columns) + 2))})")
+    with db.conn:
+        db.conn.executemany(sql, values())
+    return count
+
+def add_import_route(app, path, endpoint):
+    """
+    Serve POSTs to `path` with `endpoint(req)`, a plain Starlette endpoint
+    returning a Response. FastHTML routes read and parse the whole body
+    before their handler runs (and fail on a bare JSON array), which would
+    leave read_import nothing to limit.
+    """
+    app.router.add_route(path, endpoint, methods=['POST'])
+
+async def import_request(req, db, table, fields, defaults=None):
+    """Read, parse and store an import request off the event loop; returns the row count."""
+    fmt, text = await read_import(req)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, lambda: import_rows(db, table, parse_rows(fmt, text, fields),
+                                                                 fields, defaults))
+
+def export_pages(db, table, columns):
+    """Pages of up to EXPORT_CHUNK rows (tuples of `columns`) in id order."""
+    last = 0
+    while True:
+        rows = db.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE id > ? ORDER BY id LIMIT ?",
+                          [last, EXPORT_CHUNK]).fetchall()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][columns.index('id')]
+
+def export_csv(db, table, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in export_pages(db, table, columns):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def export_json(db, table, columns):
+    """A JSON array of objects, one row per line."""
+    separator = '[\n'
+    for rows in export_pages(db, table, columns):
+        yield separator + ',\n'.join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) for row in rows)
+        separator = ',\n'
+    yield '[]\n' if separator == '[\n' else '\n]\n'
+
+def export_response(db, table, columns, fmt, name):
+    """A streamed CSV or JSON download of the whole table."""
+    stamp = datetime.now().strftime('%Y%m%d')
+    media_type = 'text/csv' if fmt == 'csv' else 'application/json'
+    body = export_csv(db, table, columns) if fmt == 'csv' else export_json(db, table, columns)
+    return StreamingResponse(body, media_type=media_type,
+                             headers={'Content-Disposition': f'attachment; filename="{name}-{stamp}.{fmt}"'})
+
+def bulk_section(base):
+    """Collapsed paste-a-list import form and export links for the app page under `base`"""
+    return Details(
+        Summary('Paste a list or export', style='cursor: pointer; color: #666;'),
+        Form(
+            Textarea(name='text', placeholder='One item per line...', rows=6,
+                     style='width: 100%; padding: 8px; margin: 10px 0;'),
+            Button('Import', type='submit',
+                   style='padding: 8px 16px; background-color: #007bff; color: white; border: none; cursor: pointer;'),
+            method='post',
+            action=f'{base}/import'
+        ),
+        P('Export: ', A('CSV', href=f'{base}/export?format=csv'), ' · ', A('JSON', href=f'{base}/export?format=json'),
+          style='margin: 10px 0 0;'),
+        style='margin-bottom: 20px;'
+    )
@@ -0,0 +1,160 @@
+"""
+Shared SQLite setup for the apps.
+
+`open_db(path, migrations)` returns a fastlite Database that:
+  - gives every thread its own connection (FastHTML runs sync routes in a
+    threadpool, and one apsw connection refuses concurrent use from two
+    threads), each opened with the explicit PRAGMAS below and a larger
+    prepared-statement cache;
+  - converts the file to incremental auto_vacuum once, so common/backup.py
+    can give free pages back a little at a time;
+  - applies the app's schema migrations (a MIGRATIONS list in each app)
+    once each, tracked in PRAGMA user_version;
+  - runs PRAGMA optimize and a WAL checkpoint every MAINTENANCE_INTERVAL
+    seconds on a background thread.
+
+Apps import it from the repository root:
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from common.db import open_db
+
+Numbers behind the pragma choices: common/bench_db.py.
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+import apsw
+import fastlite
+
+PRAGMAS = {
+    'journal_mode': 'wal',
+    # In WAL mode NORMAL stays consistent after a crash; it only skips the
+    # fsync on each commit, which is what makes single-row writes slow
+    'synchronous': 'normal',
+    # With a connection per thread, writers queue for the write lock; wait
+    # for it rather than failing with SQLITE_BUSY at once
+    'busy_timeout': 5000,
+    # Per connection, so modest (negative means KiB); mmap below shares the
+    # OS page cache between all connections instead
+    'cache_size': -4096,
+    'mmap_size': 128 * 2**20,
+    'temp_store': 'memory',
+    # Truncate the WAL back to this size after checkpoints
+    'journal_size_limit': 64 * 2**20,
+}
+# apsw keeps this many prepared statements per connection and reuses them
+# whenever the same SQL text runs again
+STATEMENT_CACHE = 256
+# fastlite turns on apsw's best-practice hooks, which run PRAGMA optimize on
+# every new connection before our busy_timeout applies; while another
+# connection writes that can fail with SQLITE_BUSY, so opening is retried
+CONNECT_ATTEMPTS = 100
+CONNECT_RETRY_DELAY = 0.05
+MAINTENANCE_INTERVAL = float(os.environ.get('LALTEN_DB_MAINTENANCE_INTERVAL', 3600))
+
+class Database(fastlite.Database):
+    """fastlite's Database with one connection per thread, opened with `pragmas`."""
+
+    def __init__(self, path, pragmas=PRAGMAS):
+        self.path = str(path)
+        self.pragmas = pragmas
+        self._local = threading.local()
+        super().__init__(self._connect())
+
+    def _connect(self):
+        for attempt in range(CONNECT_ATTEMPTS):
+            try:
+                conn = apsw.Connection(self.path, statementcachesize=STATEMENT_CACHE)
+                break
+            except apsw.BusyError:
+                if attempt == CONNECT_ATTEMPTS - 1:
+                    raise
+                time.sleep(CONNECT_RETRY_DELAY)
+        for name, value in self.pragmas.items():
+            conn.pragma(name, value)
+        return conn
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    @conn.setter
+    def conn(self, conn):
+        self._local.conn = conn
+
+def create_table(name, seed=None, /, **columns):
+    """
+    The first migration of an app: create table `name` with fastlite's
+    create(**columns) and hand the new table to `seed`, if given. Databases
+    from before versioned migrations start at version 0 but already have
+    the table; for them this does nothing.
+    """
+    def step(db):
+        table = db.t[name]
+        if table not in db.t:
+            table.create(**columns)
+            if seed:
+                seed(table)
+    return step
+
+def migrate(db, migrations):
+    """
+    Bring the schema up to date: apply the migrations past PRAGMA
+    user_version in order, each in its own transaction with the version bump.
+    A migration is SQL (several statements are fine) or a callable taking db.
+    Migrations are append-only: never edit or reorder ones already shipped,
+    since a database's version only records how many it has applied.
+    """
+    version = db.conn.pragma('user_version')
+    for number, step in enumerate(migrations[version:], version + 1):
+        with db.conn:
+            if callable(step):
+                step(db)
+            else:
+                db.conn.execute(step)
+            db.conn.pragma('user_version', number)
+
+def use_incremental_vacuum(db):
+    """
+    Switch the database to incremental auto_vacuum if it is not already.
+    The switch takes one VACUUM, which rewrites the file under the write
+    lock; it happens once per database, when an app first opens it, and is
+    instant for a new file. WAL mode is kept throughout.
+    """
+    if db.conn.pragma('auto_vacuum') != 2:
+        db.conn.pragma('auto_vacuum', 'incremental')
+        db.conn.execute('VACUUM')
+
+def maintain(db):
+    """Refresh query planner statistics where needed and checkpoint the WAL."""
+    db.conn.execute('PRAGMA optimize')
+    db.conn.wal_checkpoint(mode=apsw.SQLITE_CHECKPOINT_PASSIVE)
+
+def _maintenance_loop(db, interval, stop):
+    while not stop.wait(interval):
+        try:
+            maintain(db)
+        except apsw.Error as e:
+            print(f"Database maintenance failed: {e}")
+
+def open_db(path, migrations=(), maintenance_interval=MAINTENANCE_INTERVAL):
+    """
+    Open an app database: create its directory, migrate, and schedule
+    maintenance (none if the interval is 0). Setting the Event kept as
+    db.maintenance stops the maintenance thread.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    db = Database(path)
+    use_incremental_vacuum(db)
+    migrate(db, list(migrations))
+    db.maintenance = threading.Event()
+    if maintenance_interval:
+        threading.Thread(target=_maintenance_loop, args=(db, maintenance_interval, db.maintenance),
+                         name=f'db-maintenance-{path}', daemon=True).start()
+    return db
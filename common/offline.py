@@ -0,0 +1,352 @@
+"""
+Offline support for the notes and menu apps.
+
+  - SERVICE_WORKER caches the app's page and the scripts and styles it
+    loads, so the app opens without a connection: the page network first
+    (the cached copy once NETWORK_TIMEOUT passes), assets cache first.
+  - client_script() makes the page queue its actions (add, archive,
+    update, delete...) in localStorage while offline, patch the page at
+    once, and send the queue to <app>/sync in one request when the
+    connection is back. Online, the forms post as usual.
+  - apply_batch() applies such a batch in one transaction. Rows carry
+    updated_at; an operation on a row applies only if it was made (on the
+    device, by its clock capped at the server's) no earlier than the row's
+    last change, so the latest edit wins. Adds carry a client key, so a
+    batch sent again after a lost response does not add twice.
+
+Tables need `updated_at TEXT` and `client_key TEXT` columns, the latter
+with a unique index: see sync_migration().
+"""
+
+import json
+import re
+from datetime import datetime, timezone
+from fasthtml.common import Response, to_xml
+
+# Most operations applied per request; clients drop from their queue only
+# the operations they got a result for and send the rest next
+MAX_BATCH = 200
+# How long the service worker waits for the page before using its copy
+NETWORK_TIMEOUT_MS = 3000
+# How long the page collects taps before syncing, and how often it retries
+# while the queue cannot be sent
+SYNC_DELAY_MS = 300
+RETRY_MS = 15000
+# Operation times as browsers write them (Date.toISOString)
+TIME_FORMAT = re.compile(r'\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{3}Z')
+
+SERVICE_WORKER = """
+const SCOPE = __SCOPE__;
+const CACHE = SCOPE + '-offline-v1';
+
+self.addEventListener('install', event => {
+  event.waitUntil(caches.open(CACHE).then(cache => cache.add(SCOPE)).then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+  event.waitUntil(caches.keys()
+    .then(keys => Promise.all(keys.filter(key => key.startsWith(SCOPE + '-offline-') && key !== CACHE)
+                                  .map(key => caches.delete(key))))
+    .then(() => self.clients.claim()));
+});
+
+// The page sends the scripts and styles it loaded, cross-origin ones included
+self.addEventListener('message', event => {
+  const urls = event.data.cache || [];
+  event.waitUntil(caches.open(CACHE).then(cache => Promise.all(urls.map(async url => {
+    if (await cache.match(url)) return;
+    const sameOrigin = new URL(url).origin === location.origin;
+    await cache.add(new Request(url, sameOrigin ? {} : {mode: 'no-cors'})).catch(() => {});
+  }))));
+});
+
+async function page(request) {
+  const cache = await caches.open(CACHE);
+  const network = fetch(request).then(response => {
+    if (response.ok) cache.put(SCOPE, response.clone());
+    return response;
+  });
+  const timeout = new Promise((_, reject) => setTimeout(reject, __TIMEOUT__));
+  try {
+    return await Promise.race([network, timeout]);
+  } catch (error) {
+    return (await cache.match(SCOPE)) || network;
+  }
+}
+
+async function asset(request) {
+  const cache = await caches.open(CACHE);
+  const cached = await cache.match(request);
+  const network = fetch(request).then(response => {
+    if (response.ok || response.type === 'opaque') cache.put(request, response.clone());
+    return response;
+  });
+  if (!cached) return network;
+  network.catch(() => {});
+  return cached;
+}
+
+self.addEventListener('fetch', event => {
+  const request = event.request;
+  if (request.method !== 'GET') return;
+  const path = new URL(request.url).pathname;
+  if (request.mode === 'navigate' && (path === SCOPE || path === SCOPE + '/'))
+    event.respondWith(page(request));
+  else if (['script', 'style', 'font', 'image'].includes(request.destination))
+    event.respondWith(asset(request));
+});
+"""
+
+CLIENT_SCRIPT = """
+(() => {
+  const config = __CONFIG__;
+  const KEY = config.base + ':queue';
+  let queue = JSON.parse(localStorage.getItem(KEY) || '[]');
+  let syncing = false, timer = null;
+
+  const style = document.createElement('style');
+  style.textContent = '.pending { opacity: 0.5; } .pending form { pointer-events: none; }'
+    + ' .pending::after { content: "Waiting to sync"; font-size: 0.8em; color: #666; }';
+  document.head.append(style);
+  const badge = document.createElement('p');
+  badge.style.cssText = 'color: #666; font-size: 0.9em; margin: 0 0 10px;';
+  document.querySelector('main, body').prepend(badge);
+
+  const save = () => {
+    localStorage.setItem(KEY, JSON.stringify(queue));
+    badge.textContent = queue.length ? `${queue.length} change(s) waiting to sync` : '';
+  };
+  const cardFor = op => document.getElementById(op.key ? 'pending-' + op.key : config.prefix + op.id);
+
+  // Show a queued operation on the page until the server's answer replaces it
+  function patch(op) {
+    let card = cardFor(op);
+    if (op.op === 'add') {
+      if (card) return;
+      card = document.createElement('div');
+      card.id = 'pending-' + op.key;
+      card.style.cssText = 'border: 1px dashed #999; padding: 15px; margin-bottom: 15px; border-radius: 5px;';
+      const text = document.createElement('p');
+      text.className = 'content';
+      text.textContent = op.values.content;
+      card.append(text);
+      document.querySelector(config.list).prepend(card);
+    }
+    if (!card) return;
+    card.classList.add('pending');
+    if (op.op === 'delete') card.hidden = true;
+    const move = (config.actions[op.action] || {}).move;
+    if (move) document.querySelector(move).prepend(card);
+    if (op.op === 'set' && 'content' in op.values) card.querySelector('.content').textContent = op.values.content;
+  }
+
+  // Replace the patched card with the row as the server now has it, if any
+  function settle(op, result) {
+    const card = cardFor(op);
+    if (!card) return;
+    if (!result.html) return card.remove();
+    const fresh = document.createRange().createContextualFragment(result.html).firstElementChild;
+    // A copy the event stream or another page load put elsewhere; for
+    // updates the patched card itself has the id and is replaced in place
+    const dup = document.getElementById(fresh.id);
+    if (dup && dup !== card) dup.remove();
+    card.replaceWith(fresh);
+    htmx.process(fresh);
+  }
+
+  async function sync() {
+    timer = null;
+    if (syncing || !queue.length) return;
+    syncing = true;
+    const batch = queue.slice(0, config.batch);
+    try {
+      const response = await fetch(config.base + '/sync', {
+        method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({ops: batch})});
+      if (!response.ok) throw new Error(`sync failed: ${response.status}`);
+      const {results} = await response.json();
+      queue = queue.slice(results.length);
+      save();
+      results.forEach((result, i) => settle(batch[i], result));
+    } catch (error) {
+      // Offline or the server is down: keep the queue and try again
+      schedule(config.retry);
+      return;
+    } finally {
+      syncing = false;
+    }
+    if (queue.length) schedule(0);
+  }
+
+  // Later taps push the sync back, so a burst of them goes in one request
+  function schedule(delay) {
+    clearTimeout(timer);
+    timer = setTimeout(sync, delay);
+  }
+
+  function enqueue(op) {
+    op.at = new Date().toISOString();
+    queue.push(op);
+    save();
+    patch(op);
+    schedule(config.delay);
+  }
+
+  // The operation a submitted action form stands for, or null
+  function opFor(form) {
+    const match = (form.getAttribute('action') || '').match(/\\/(\\w+)(?:\\/(\\d+))?$/);
+    const action = match && config.actions[match[1]];
+    if (!action) return null;
+    const op = {op: action.op, action: match[1], values: {...action.values}};
+    if (form.elements.content) op.values.content = form.elements.content.value;
+    if (action.op === 'add') op.key = Date.now().toString(36) + Math.random().toString(36).slice(2);
+    else op.id = Number(match[2]);
+    return op;
+  }
+
+  function queueForm(form, op) {
+    if ('content' in op.values && !op.values.content.trim()) return;
+    enqueue(op);
+    form.reset();
+    if ((config.actions[op.action] || {}).back) location.assign(config.base);
+  }
+
+  // Online, with nothing waiting, a form goes to the server as usual (an
+  // HTMX request or a plain post); offline, or behind queued operations
+  // it must not overtake, it is queued. Runs before htmx sees the submit.
+  document.addEventListener('submit', event => {
+    const form = event.target;
+    const op = opFor(form);
+    const action = op && config.actions[op.action];
+    if (!op || (navigator.onLine && (!queue.length || action.prompt))) return;
+    if (action.prompt) {
+      // Opening the edit page needs the network; offline, edit in place
+      const card = document.getElementById(config.prefix + op.id);
+      const content = prompt('Edit', card ? card.querySelector('.content').textContent : '');
+      if (content === null) return event.preventDefault();
+      op.values.content = content;
+    }
+    event.preventDefault();
+    event.stopPropagation();
+    queueForm(form, op);
+  }, true);
+
+  // The connection claimed to be up but the HTMX request never got an
+  // answer: queue it instead
+  document.addEventListener('htmx:sendError', event => {
+    const form = event.detail.elt.closest('form');
+    const op = form && opFor(form);
+    if (op && !config.actions[op.action].prompt) queueForm(form, op);
+  });
+
+  queue.forEach(patch);
+  save();
+  schedule(0);
+  addEventListener('online', () => schedule(0));
+
+  if ('serviceWorker' in navigator) {
+    navigator.serviceWorker.register(config.base + '/service-worker', {scope: config.base});
+    navigator.serviceWorker.ready.then(registration => registration.active.postMessage({
+      cache: [...document.querySelectorAll('script[src], link[rel=stylesheet]')].map(el => el.src || el.href)}));
+  }
+})();
+"""
+
+def sync_migration(table):
+    """
+    The migration adding what apply_batch() needs to `table`: updated_at,
+    so the latest change to a row wins, and a unique client_key, so a
+    resent batch adds nothing twice.
+    """
+    return f"""ALTER TABLE {table} ADD COLUMN updated_at TEXT;
+       ALTER TABLE {table} ADD COLUMN client_key TEXT;
+       CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_client_key ON {table} (client_key)"""
+
+def service_worker(scope):
+    """The service worker for an app served under `scope` (e.g. '/notes')."""
+    script = SERVICE_WORKER.replace('__SCOPE__', json.dumps(scope)).replace('__TIMEOUT__', str(NETWORK_TIMEOUT_MS))
+    # The page itself lives at the scope without its trailing slash, which
+    # is outside the worker's default scope of /notes/
+    return Response(script, media_type='application/javascript',
+                    headers={'Service-Worker-Allowed': scope, 'Cache-Control': 'no-cache'})
+
+def client_script(base, prefix, list_selector, actions):
+    """
+    The page script for an app under `base`. Cards have ids `prefix` + row
+    id and their text in a `.content` element; added rows go to the top of
+    `list_selector`. `actions` maps the last word of a form's action URL
+    (before an id) to {'op': 'add'|'set'|'delete', 'values': {...}} plus
+    optionally 'move' (a list selector the card goes to), 'prompt' (offline,
+    edit the content in a prompt instead of following the form) and 'back'
+    (return to the app page afterwards).
+    """
+    config = {'base': base, 'prefix': prefix, 'list': list_selector, 'actions': actions,
+              'batch': MAX_BATCH, 'delay': SYNC_DELAY_MS, 'retry': RETRY_MS}
+    return CLIENT_SCRIPT.replace('__CONFIG__', json.dumps(config))
+
+def utc_now():
+    """The current UTC time as browsers write it (Date.toISOString)."""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+def apply_batch(db, table, ops, fields, defaults=None):
+    """
+    Apply up to MAX_BATCH operations from a client queue in one transaction.
+    `fields` maps the columns clients may set to their allowed values (None
+    for any non-blank string); adds get `defaults` for the rest. Returns a
+    result per operation applied: {'status': 'applied' | 'conflict' (the row
+    changed later) | 'missing' | 'invalid', 'id': the row id}.
+    """
+    now = utc_now()
+    with db.conn:
+        return [_apply(db.conn, table, op, fields, defaults or {}, now) for op in ops[:MAX_BATCH]]
+
+def _valid(values, fields):
+    return isinstance(values, dict) and all(
+        name in fields and isinstance(value, str) and value.strip()
+        and (fields[name] is None or value in fields[name])
+        for name, value in values.items())
+
+def _apply(conn, table, op, fields, defaults, now):
+    kind, values, at, row_id = op.get('op'), op.get('values', {}), op.get('at'), op.get('id')
+    if not (isinstance(at, str) and TIME_FORMAT.fullmatch(at)) or not _valid(values, fields):
+        return {'status': 'invalid', 'id': row_id}
+    # A device clock running ahead must not win every later conflict
+    at = min(at, now)
+    if kind == 'add':
+        key = op.get('key')
+        if not (isinstance(key, str) and key and values.get('content')):
+            return {'status': 'invalid', 'id': None}
+        row = {**defaults, **values, 'created_at': datetime.now().isoformat(), 'updated_at': at, 'client_key': key}
+        conn.execute(f"INSERT INTO {table} ({', '.join(row)}) VALUES ({', '.join('?' * len(row))}) "
+                     "ON CONFLICT (client_key) DO NOTHING", list(row.values()))
+        row_id = conn.execute(f"SELECT id FROM {table} WHERE client_key = ?", [key]).fetchone()[0]
+        return {'status': 'applied', 'id': row_id}
+    if not isinstance(row_id, int) or isinstance(row_id, bool):
+        return {'status': 'invalid', 'id': None}
+    newer = '(updated_at IS NULL OR updated_at <= ?)'
+    if kind == 'set' and values:
+        assignments = ', '.join(f'{name} = ?' for name in values)
+        conn.execute(f"UPDATE {table} SET {assignments}, updated_at = ? WHERE id = ? AND {newer}",
+                     [*values.values(), at, row_id, at])
+    elif kind == 'delete':
+        conn.execute(f"DELETE FROM {table} WHERE id = ? AND {newer}", [row_id, at])
+    else:
+        return {'status': 'invalid', 'id': row_id}
+    if conn.changes():
+        return {'status': 'applied', 'id': row_id}
+    exists = conn.execute(f"SELECT 1 FROM {table} WHERE id = ?", [row_id]).fetchone()
+    return {'status': 'conflict' if exists else 'missing', 'id': row_id}
+
+def current_rows(table, results):
+    """The rows the results refer to, as they are now, by id."""
+    ids = sorted({result['id'] for result in results if result['id'] is not None})
+    rows = {}
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        for row in table(where=f"id IN ({', '.join('?' * len(chunk))})", where_args=chunk):
+            rows[row.id] = row
+    return rows
+
+def batch_response(results, rows, card):
+    """The /sync answer: each result with its row rendered by `card`, or '' if gone."""
+    return {'results': [{**result, 'html': to_xml(card(rows[result['id']])) if result['id'] in rows else ''}
+                        for result in results]}
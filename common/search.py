@@ -0,0 +1,76 @@
+"""
+Full-text search for the notes and menu apps.
+
+Each app's table gets an external-content FTS5 index over its `content`
+column (fts_migration), kept in step by triggers. search() ranks matches
+with bm25 and returns them with the matching words marked, which marked()
+turns into Mark elements; search_form() is the search-as-you-type box.
+"""
+
+import re
+from fasthtml.common import Form, Input, Mark
+
+# Most search results shown at once; ranking reads every match it is given,
+# so common words are ranked among their newest RANK_WINDOW matches only
+SEARCH_LIMIT = 20
+RANK_WINDOW = 250
+
+def fts_migration(table):
+    """
+    The migration adding `table`_fts: an external-content FTS5 table kept
+    in step by triggers and built from the existing rows. Prefix indexes
+    keep the short prefixes search-as-you-type sends cheap.
+    """
+    fts = f'{table}_fts'
+    return f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(content, content='{table}', content_rowid='id',
+           tokenize='unicode61 remove_diacritics 2', prefix='2 3');
+       INSERT INTO {fts}({fts}) VALUES ('rebuild');
+       CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN
+           INSERT INTO {fts}(rowid, content) VALUES (new.id, new.content); END;
+       CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN
+           INSERT INTO {fts}({fts}, rowid, content) VALUES ('delete', old.id, old.content); END;
+       CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF content ON {table} BEGIN
+           INSERT INTO {fts}({fts}, rowid, content) VALUES ('delete', old.id, old.content);
+           INSERT INTO {fts}(rowid, content) VALUES (new.id, new.content); END"""
+
+def match_query(q):
+    """An FTS5 query for the words in `q`: all must match, the last as a prefix
+    once it has two letters (a one-letter prefix expands to most of the index).
+    Every word is quoted, so no FTS5 syntax from the user gets through"""
+    words = re.findall(r'\w+', q)[:10]
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words) + ('*' if len(words[-1]) > 1 else '')
+
+def search(db, table, q, columns=(), limit=SEARCH_LIMIT):
+    """Best-ranked of the newest RANK_WINDOW rows of `table` matching `q`, as
+    (id, *columns, highlighted content) rows with matches between \x02 and \x03 markers"""
+    query = match_query(q)
+    if query is None:
+        return []
+    fts = f'{table}_fts'
+    return db.execute(
+        f"""SELECT {', '.join(['id', *columns, 'text'])} FROM (
+               SELECT rowid AS id, bm25({fts}) AS score, highlight({fts}, 0, char(2), char(3)) AS text
+               FROM {fts} WHERE {fts} MATCH ? ORDER BY rowid DESC LIMIT ?)
+           JOIN {table} USING (id) ORDER BY score LIMIT ?""",
+        [query, RANK_WINDOW, limit]).fetchall()
+
+def marked(text):
+    """Highlighted text from search() as strings and Mark elements (escaped as usual)"""
+    parts = re.split('[\x02\x03]', text)
+    return [Mark(part) if i % 2 else part for i, part in enumerate(parts)]
+
+def search_form(base, placeholder, q=''):
+    """Search box for the app under `base`: results replace #search-results
+    as you type; a plain GET without JS"""
+    return Form(
+        Input(type='search', name='q', value=q, placeholder=placeholder, autocomplete='off',
+              style='width: 100%; padding: 8px;'),
+        method='get',
+        action=f'{base}/search',
+        hx_get=f'{base}/search',
+        hx_trigger='submit, input delay:200ms',
+        hx_target='#search-results',
+        style='width: 100%; margin-bottom: 10px;'
+    )
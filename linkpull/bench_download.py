@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Throughput and correctness of downloader.py against a local HTTP server.
+
+The server (run in a subprocess) serves deterministic files with
+Content-Length and Range support, adds --latency before each response to
+stand in for a remote host, and in flaky mode cuts every file's first
+response off halfway so the downloader has to resume. Each case checks
+every downloaded byte.
+
+    python bench_download.py [--small 300] [--large 4] [--large-mb 64] [--latency 0.05]
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import downloader
+from scraper import close_client
+
+PATTERN = bytes(range(256)) * 4096
+
+def content(path, size):
+    """Deterministic bytes for `path`: the pattern rotated by a per-path offset."""
+    shift = sum(path.encode()) % 256
+    data = (PATTERN[shift:] + PATTERN[:shift]) * (size // len(PATTERN) + 1)
+    return data[:size]
+
+def server_main(port, small_size, large_size, latency, flaky):
+    cache = {}
+    cut = set()
+
+    def body(path):
+        size = large_size if path.startswith('/large/') else small_size
+        if path not in cache:
+            cache[path] = content(path, size)
+        return cache[path]
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1')
+                path = head.split(' ', 2)[1]
+                data = body(path)
+                await asyncio.sleep(latency)
+                match = re.search(r'(?im)^range:\s*bytes=(\d+)-\s*$', head)
+                start = int(match.group(1)) if match else 0
+                if start >= len(data):
+                    writer.write(b'HTTP/1.1 416 Range Not Satisfiable\r\nContent-Range: bytes */%d\r\n'
+                                 b'Content-Length: 0\r\n\r\n' % len(data))
+                    await writer.drain()
+                    continue
+                if match:
+                    status = b'206 Partial Content'
+                    extra = b'Content-Range: bytes %d-%d/%d\r\n' % (start, len(data) - 1, len(data))
+                else:
+                    status, extra = b'200 OK', b''
+                writer.write(b'HTTP/1.1 %s\r\nContent-Type: application/octet-stream\r\n'
+                             b'Content-Length: %d\r\n%s\r\n' % (status, len(data) - start, extra))
+                view = memoryview(data)[start:]
+                if flaky and path not in cut:
+                    # Send half, then drop the connection mid-body
+                    cut.add(path)
+                    writer.write(view[:len(view) // 2])
+                    await writer.drain()
+                    break
+                for i in range(0, len(view), 1 << 20):
+                    writer.write(view[i:i + (1 << 20)])
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve():
+        server = await asyncio.start_server(handle, '127.0.0.1', port, backlog=1024)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+def wait_for_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'port {port} did not open')
+
+async def run_case(urls, dest):
+    job = downloader.DownloadJob(urls, dest)
+    await job.run()
+    await close_client()
+    return job
+
+def verify(job, small_size, large_size):
+    bad = 0
+    for state in job.files:
+        path = '/' + state.url.split('/', 3)[3]
+        size = large_size if path.startswith('/large/') else small_size
+        with open(state.path, 'rb') as f:
+            if state.status != 'done' or f.read() != content(path, size):
+                bad += 1
+    return bad
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'server':
+        return server_main(int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4]),
+                           float(sys.argv[5]), sys.argv[6] == '1')
+
+    parser = argparse.ArgumentParser(description='Benchmark the linkpull downloader.')
+    parser.add_argument('--small', type=int, default=300, help='number of small files')
+    parser.add_argument('--small-kb', type=int, default=64)
+    parser.add_argument('--large', type=int, default=4, help='number of large files')
+    parser.add_argument('--large-mb', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=0.05, help='server delay before each response (s)')
+    parser.add_argument('--port', type=int, default=8795)
+    args = parser.parse_args()
+    small_size, large_size = args.small_kb * 1024, args.large_mb * 2**20
+
+    cases = [
+        # (label, flaky server, file paths, concurrency overrides)
+        ('small, sequential', False, [f'/small/{i}.bin' for i in range(args.small)], 1),
+        ('small, parallel', False, [f'/small/{i}.bin' for i in range(args.small)], None),
+        ('large, sequential', False, [f'/large/{i}.bin' for i in range(args.large)], 1),
+        ('large, parallel', False, [f'/large/{i}.bin' for i in range(args.large)], None),
+        ('small, flaky (resume)', True, [f'/small/r{i}.bin' for i in range(args.small // 10)], None),
+        ('large, flaky (resume)', True, [f'/large/r{i}.bin' for i in range(args.large)], None),
+    ]
+    defaults = downloader.CONCURRENCY, downloader.PER_HOST
+    print(f"{args.small} x {args.small_kb} KiB and {args.large} x {args.large_mb} MiB, "
+          f"{args.latency * 1000:g} ms server latency; parallel = {defaults[0]} at once, {defaults[1]} per host")
+    print(f"{'case':22} | {'files':>5} | {'MiB':>6} | {'time':>7} | {'MiB/s':>7} | {'files/s':>7} | bad")
+    for label, flaky, paths, concurrency in cases:
+        server = subprocess.Popen([sys.executable, __file__, 'server', str(args.port), str(small_size),
+                                   str(large_size), str(args.latency), '1' if flaky else '0'])
+        dest = tempfile.mkdtemp(prefix='linkpull-bench-')
+        try:
+            wait_for_port(args.port)
+            downloader.CONCURRENCY = concurrency or defaults[0]
+            downloader.PER_HOST = concurrency or defaults[1]
+            urls = [f'http://127.0.0.1:{args.port}{path}' for path in paths]
+            start = time.perf_counter()
+            job = asyncio.run(run_case(urls, dest))
+            elapsed = time.perf_counter() - start
+            mib = sum(os.path.getsize(state.path) for state in job.files if state.status == 'done') / 2**20
+            bad = verify(job, small_size, large_size)
+            print(f"{label:22} | {len(job.files):5} | {mib:6.0f} | {elapsed:5.2f} s | {mib / elapsed:7.1f} | "
+                  f"{len(job.files) / elapsed:7.1f} | {bad}")
+        finally:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(dest, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Load test for link extraction: concurrent-request throughput of the old
+sync path (requests + BeautifulSoup in a sync route, i.e. Starlette's
+worker threads) against the async path in scraper.py.
+
+A local target server answers after --delay seconds with a page of --links
+anchors, standing in for a slow site. Each mode runs in its own uvicorn
+process and gets --requests requests with --concurrency in flight.
+
+    python bench_extract.py [--requests 200] [--concurrency 50] [--delay 1]
+"""
+
+import argparse
+import asyncio
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+
+def target_main(port, delay, links):
+    """Slow site: sleeps `delay` seconds, then serves `links` anchors."""
+    page = ('<html><body>' + ''.join(f'<a href="/files/doc{i}.pdf">doc {i}</a>\n' for i in range(links))
+            + '</body></html>').encode()
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                await reader.readuntil(b'\r\n\r\n')
+                await asyncio.sleep(delay)
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: %d\r\n\r\n%s'
+                             % (len(page), page))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve():
+        server = await asyncio.start_server(handle, '127.0.0.1', port, backlog=1024)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+def app_main(mode, port):
+    """Minimal app exposing one extraction route, sync (before) or async (after)."""
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    if mode == 'before':
+        import re
+        import requests
+        from bs4 import BeautifulSoup
+        from urllib.parse import urljoin
+
+        # The pre-async scrape_links, as a sync route (runs in worker threads)
+        def extract(request):
+            url, pat = request.query_params['url'], request.query_params.get('pattern')
+            response = requests.get(url, timeout=10)
+            response.raise_for_status()
+            soup = BeautifulSoup(response.text, 'html.parser')
+            links = [urljoin(url, a['href']) for a in soup.find_all('a', href=True)]
+            if pat:
+                links = [link for link in links if re.search(pat, link)]
+            return JSONResponse({'count': len(links)})
+    else:
+        from scraper import scrape_links
+
+        async def extract(request):
+            success, result = await scrape_links(request.query_params['url'],
+                                                 request.query_params.get('pattern'))
+            return JSONResponse({'count': len(result) if success else result})
+
+    app = Starlette(routes=[Route('/extract', extract)])
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning', backlog=1024)
+
+def wait_for_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'port {port} did not open')
+
+async def load(url, target, total, concurrency):
+    """Fire `total` requests with `concurrency` in flight; return (wall time, latencies, errors)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(client):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.get(url, params={'url': target, 'pattern': r'.*\.pdf$'})
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[one(client) for _ in range(total)])
+        return time.perf_counter() - start, latencies, errors
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'target':
+        return target_main(int(sys.argv[2]), float(sys.argv[3]), int(sys.argv[4]))
+    if len(sys.argv) > 1 and sys.argv[1] in ('before', 'after'):
+        return app_main(sys.argv[1], int(sys.argv[2]))
+
+    parser = argparse.ArgumentParser(description='Load test sync vs async link extraction.')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--delay', type=float, default=1.0, help='target site response delay (s)')
+    parser.add_argument('--links', type=int, default=200, help='anchors on the target page')
+    parser.add_argument('--target-port', type=int, default=8781)
+    parser.add_argument('--app-port', type=int, default=8780)
+    args = parser.parse_args()
+
+    target = subprocess.Popen([sys.executable, __file__, 'target', str(args.target_port),
+                               str(args.delay), str(args.links)])
+    try:
+        wait_for_port(args.target_port)
+        target_url = f'http://127.0.0.1:{args.target_port}/index.html'
+        print(f"{args.requests} requests, {args.concurrency} in flight, target delay {args.delay:g} s, {args.links} links")
+        print(f"{'mode':7} | {'req/s':>7} | {'p50':>8} | {'p95':>8} | errors")
+        for mode in ('before', 'after'):
+            app = subprocess.Popen([sys.executable, __file__, mode, str(args.app_port)])
+            try:
+                wait_for_port(args.app_port)
+                wall, latencies, errors = asyncio.run(load(f'http://127.0.0.1:{args.app_port}/extract',
+                                                   target_url, args.requests, args.concurrency))
+            finally:
+                app.terminate()
+                app.wait()
+            latencies.sort()
+            p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+            print(f"{mode:7} | {len(latencies) / wall:7.1f} | {statistics.median(latencies):6.2f} s | "
+                  f"{p95:6.2f} s | {errors}")
+    finally:
+        target.terminate()
+        target.wait()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Time and peak memory of link extraction on large synthetic pages:
+BeautifulSoup on the whole body (scraper.extract_links) against the
+streaming LinkParser fed in network-sized chunks.
+
+    python bench_parse.py [--sizes 1,10] [--chunk 65536]
+"""
+
+import argparse
+import time
+import tracemalloc
+from link_parser import LinkParser
+from scraper import extract_links
+
+BASE_URL = 'https://mirror.example.org/pub/archive/'
+
+def directory_listing(target_bytes):
+    """Apache-style autoindex table, one row per file."""
+    rows = ['<html><head><title>Index of /pub/archive</title></head><body>',
+            '<h1>Index of /pub/archive</h1><table>',
+            '<tr><th><a href="?C=N;O=D">Name</a></th><th><a href="?C=M;O=A">Last modified</a></th></tr>']
+    size, i = 0, 0
+    while size < target_bytes:
+        row = (f'<tr><td valign="top"><img src="/icons/compressed.gif" alt="[   ]"></td>'
+               f'<td><a href="release-{i}.tar.gz">release-{i}.tar.gz</a></td>'
+               f'<td align="right">2024-01-{i % 28 + 1:02d} 12:00  </td><td align="right">{i % 900}M</td></tr>\n')
+        rows.append(row)
+        size += len(row)
+        i += 1
+    rows.append('</table></body></html>')
+    return ''.join(rows)
+
+def archive_index(target_bytes):
+    """Nested list page with a <base href> and mixed absolute/relative links."""
+    parts = ['<html><head><base href="https://files.example.org/mirror/"></head><body><ul>']
+    size, i = 0, 0
+    while size < target_bytes:
+        part = (f'<li class="entry"><a href="{i // 100}/paper-{i}.pdf" title="Paper &amp; notes {i}">Paper {i}</a>'
+                f' <span>(<a href="https://doi.example.org/10.{i}">doi</a>)</span></li>\n')
+        parts.append(part)
+        size += len(part)
+        i += 1
+    parts.append('</ul></body></html>')
+    return ''.join(parts)
+
+def streaming(html, chunk):
+    parser = LinkParser(BASE_URL)
+    links = []
+    for i in range(0, len(html), chunk):
+        parser.feed(html[i:i + chunk])
+        links.extend(parser.take())
+    parser.close()
+    links.extend(parser.take())
+    return links
+
+def measure(fn, *args):
+    """Time an untraced run, then take peak allocation from a traced one."""
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark BeautifulSoup vs streaming link extraction.')
+    parser.add_argument('--sizes', default='1,10', help='page sizes in MB, comma separated')
+    parser.add_argument('--chunk', type=int, default=65536, help='streaming feed size in characters')
+    args = parser.parse_args()
+
+    print(f"{'page':22} | {'links':>7} | {'soup time':>9} | {'soup peak':>9} | {'stream time':>11} | {'stream peak':>11}")
+    for mb in (int(s) for s in args.sizes.split(',')):
+        for name, make in (('listing', directory_listing), ('archive index', archive_index)):
+            html = make(mb * 1_000_000)
+            # Peak includes only what the extractor allocates, not the page itself;
+            # the streaming parser's results are kept too, as the caller would
+            soup_time, soup_peak, soup_links = measure(extract_links, html, BASE_URL)
+            stream_time, stream_peak, stream_links = measure(streaming, html, args.chunk)
+            assert soup_links == stream_links, f'{name}: extractors disagree'
+            print(f"{f'{name} {mb} MB':22} | {len(soup_links):7} | {soup_time:7.2f} s | "
+                  f"{soup_peak / 2**20:6.0f} MiB | {stream_time:9.2f} s | {stream_peak / 2**20:8.0f} MiB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Batch and recursive crawl: fetch several seed pages, optionally follow
+their page links a few levels deep, and report links as each page finishes.
+"""
+
+import asyncio
+import os
+import time
+from hashlib import blake2b
+from urllib.parse import urldefrag, urlsplit
+from scraper import fetch_links, error_message
+from link_filter import FilterBudget, compile_filter
+
+# Crawl limits: pages in flight overall and per host, the minimum gap
+# between request starts on one host, and a hard cap on pages per crawl
+CONCURRENCY = int(os.environ.get('LINKPULL_CRAWL_CONCURRENCY', 8))
+PER_HOST = int(os.environ.get('LINKPULL_CRAWL_PER_HOST', 2))
+HOST_DELAY = float(os.environ.get('LINKPULL_CRAWL_HOST_DELAY', 0.25))
+MAX_PAGES = int(os.environ.get('LINKPULL_CRAWL_MAX_PAGES', 200))
+MAX_DEPTH = 5
+
+# Links worth fetching as pages: no file extension, or one of these
+PAGE_EXTENSIONS = {'html', 'htm', 'shtml', 'xhtml', 'php', 'asp', 'aspx', 'jsp', 'cgi'}
+
+class SeenSet:
+    """URLs seen so far, stored as 64-bit hashes rather than strings."""
+
+    def __init__(self):
+        self.hashes = set()
+
+    def add(self, url):
+        """Record `url`; return True if it had not been seen before."""
+        key = int.from_bytes(blake2b(url.encode(), digest_size=8).digest(), 'little')
+        if key in self.hashes:
+            return False
+        self.hashes.add(key)
+        return True
+
+    def __len__(self):
+        return len(self.hashes)
+
+class HostGate:
+    """Per-host politeness: `slots` requests in flight, starts `delay` seconds apart."""
+
+    def __init__(self, slots=PER_HOST, delay=HOST_DELAY):
+        self.slots = asyncio.Semaphore(slots)
+        self.delay = delay
+        self.next_start = 0.0
+
+    async def __aenter__(self):
+        await self.slots.acquire()
+        now = time.monotonic()
+        start = max(now, self.next_start)
+        self.next_start = start + self.delay
+        try:
+            await asyncio.sleep(start - now)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    async def __aexit__(self, *exc):
+        self.slots.release()
+
+def is_page_link(url):
+    """Guess from the URL alone whether a link is a page worth crawling."""
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        return False
+    name = parts.path.rsplit('/', 1)[-1]
+    return '.' not in name or name.rsplit('.', 1)[-1].lower() in PAGE_EXTENSIONS
+
+async def crawl(seeds, pattern=None, depth=0, same_host=True, max_pages=MAX_PAGES):
+    """
+    Crawl `seeds` up to `depth` links deep, yielding one event per page:
+      ('page', url, new_links) with new links matching `pattern`, or
+      ('error', url, message).
+    Each link is reported once across the whole crawl; fragments are dropped.
+    `pattern` must already be a valid regex.
+    """
+    link_filter = compile_filter(pattern) if pattern else None
+    # One regex budget for the whole crawl, not one per page
+    budget = FilterBudget()
+    loop = asyncio.get_running_loop()
+    seed_hosts = {urlsplit(seed).hostname for seed in seeds}
+    pages_seen, links_seen = SeenSet(), SeenSet()
+    gates = {}
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    events = asyncio.Queue()
+    tasks = set()
+    active = 0
+    scheduled = 0
+
+    def schedule(url, level):
+        nonlocal active, scheduled
+        if scheduled >= max_pages or not pages_seen.add(url):
+            return
+        scheduled += 1
+        active += 1
+        task = asyncio.create_task(visit(url, level))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    async def visit(url, level):
+        nonlocal active
+        event = None
+        try:
+            host = urlsplit(url).hostname
+            gate = gates.setdefault(host, HostGate())
+            async with gate, semaphore:
+                found = await fetch_links(url, html_only=True)
+            new_links = []
+            for link in found:
+                link = urldefrag(link).url
+                if not links_seen.add(link):
+                    continue
+                new_links.append(link)
+                if level < depth and is_page_link(link) and (
+                        not same_host or urlsplit(link).hostname in seed_hosts):
+                    schedule(link, level + 1)
+            if link_filter is not None:
+                new_links = await loop.run_in_executor(None, link_filter.apply, new_links, budget)
+            event = ('page', url, new_links)
+        except Exception as e:
+            event = ('error', url, error_message(e))
+        finally:
+            # Decrement and enqueue together so the consumer never sees
+            # active == 0 with this page's event still to come
+            active -= 1
+            if event is not None:
+                events.put_nowait(event)
+
+    for seed in seeds:
+        schedule(urldefrag(seed).url, 0)
+    try:
+        while active or not events.empty():
+            yield await events.get()
+    finally:
+        for task in tasks:
+            task.cancel()
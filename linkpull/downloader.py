@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Bulk download stage for linkpull results (the in-app getter2).
+
+Files download concurrently with a per-host limit, stream straight to a
+`.part` file, resume with HTTP Range after interruptions, and are renamed
+into place only once their size matches Content-Length. Bodies are
+requested and stored without content coding, so sizes and Range offsets
+count the same bytes the server does.
+
+    python downloader.py [--dest downloads] < links.txt
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import unquote, urlsplit
+import httpx
+from crawler import HostGate
+from scraper import get_client, close_client, error_message
+
+DOWNLOAD_DIR = os.environ.get('LINKPULL_DOWNLOAD_DIR', 'downloads')
+CONCURRENCY = int(os.environ.get('LINKPULL_DOWNLOAD_CONCURRENCY', 6))
+PER_HOST = int(os.environ.get('LINKPULL_DOWNLOAD_PER_HOST', 3))
+MAX_FILES = int(os.environ.get('LINKPULL_DOWNLOAD_MAX_FILES', 1000))
+# Bytes one job may fetch, across all its files
+MAX_BYTES = int(os.environ.get('LINKPULL_DOWNLOAD_MAX_BYTES', 4 * 2**30))
+# Jobs started from the app that may run at once
+MAX_JOBS = int(os.environ.get('LINKPULL_DOWNLOAD_MAX_JOBS', 2))
+# Free disk space downloads leave alone: no job starts below it, and files
+# stop (failed, .part removed) when writing would go under it
+MIN_FREE_BYTES = int(os.environ.get('LINKPULL_DOWNLOAD_MIN_FREE_BYTES', 2 * 2**30))
+# Attempts per file; each retry resumes from what is already on disk
+ATTEMPTS = 4
+CHUNK_SIZE = 256 * 1024
+# Finished jobs kept for the progress page
+KEEP_JOBS = 20
+
+class LengthMismatch(Exception):
+    pass
+
+class TooLarge(Exception):
+    pass
+
+class JobRefused(Exception):
+    pass
+
+# Target paths some job is writing, so two jobs never append to one .part file
+active_paths = set()
+
+class FileState:
+    """Progress of one download: status is queued, downloading, done, exists or failed."""
+
+    def __init__(self, url, path):
+        self.url = url
+        self.path = path
+        self.total = None
+        self.done = 0
+        # Bytes received by this process, for throughput
+        self.fetched = 0
+        self.status = 'queued'
+        self.error = None
+
+def file_name(url):
+    """A safe local file name for `url`: its last path segment, sanitized."""
+    name = unquote(urlsplit(url).path.rsplit('/', 1)[-1])
+    name = re.sub(r'[^\w.\-+ ]', '_', name).strip(' .')
+    return name or 'index.html'
+
+def plan_paths(urls, dest):
+    """Map URLs to files under dest/<host>/, disambiguating repeated names."""
+    taken = set()
+    files = []
+    for url in OrderedDict.fromkeys(urls):
+        host = re.sub(r'[^\w.\-]', '_', urlsplit(url).hostname or 'unknown')
+        path = os.path.join(dest, host, file_name(url))
+        if path in taken:
+            stem, ext = os.path.splitext(path)
+            path = f'{stem}-{hashlib.sha1(url.encode()).hexdigest()[:8]}{ext}'
+        taken.add(path)
+        files.append(FileState(url, path))
+    return files
+
+def free_bytes(path):
+    """Free space on the filesystem holding `path`, or its nearest existing parent."""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    return shutil.disk_usage(path).free
+
+def _total_from_range(content_range):
+    """Total size from a Content-Range header like 'bytes 100-199/1000'."""
+    match = re.match(r'bytes\s+(?:(\d+)-\d+|\*)/(\d+)', content_range or '')
+    if not match:
+        return None, None
+    start = int(match.group(1)) if match.group(1) is not None else None
+    return start, int(match.group(2))
+
+async def _fetch(client, state, job):
+    """One attempt at `state`: resume from the .part file if there is one."""
+    part = state.path + '.part'
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    # Content-Length and Range count encoded bytes, so take the body as sent
+    headers = {'Accept-Encoding': 'identity'}
+    if offset:
+        headers['Range'] = f'bytes={offset}-'
+    async with client.stream('GET', state.url, headers=headers) as response:
+        if response.status_code == 416 and offset:
+            # Nothing left to send: the part file may already be complete
+            _, total = _total_from_range(response.headers.get('content-range'))
+            if total == offset:
+                state.total = state.done = offset
+                os.replace(part, state.path)
+                return
+            os.remove(part)
+            raise LengthMismatch('Range not satisfiable; restarting from scratch')
+        response.raise_for_status()
+
+        if response.status_code == 206:
+            start, total = _total_from_range(response.headers.get('content-range'))
+            if start != offset:
+                raise LengthMismatch(f'Server resumed at {start}, expected {offset}')
+            mode = 'ab'
+        else:
+            # Server ignored the Range header: start over
+            offset = 0
+            length = response.headers.get('content-length')
+            total = int(length) if length is not None else None
+            mode = 'wb'
+
+        if total is not None and job.bytes_done() + total - offset > MAX_BYTES:
+            raise TooLarge(f'{total / 2**20:.1f} MiB is over the job limit of {MAX_BYTES / 2**20:.0f} MiB')
+        if total is not None and free_bytes(part) - (total - offset) < MIN_FREE_BYTES:
+            raise TooLarge(f'{total / 2**20:.1f} MiB would leave less than {MIN_FREE_BYTES / 2**20:.0f} MiB of disk free')
+        state.total = total
+        state.done = offset
+        with open(part, mode) as f:
+            async for chunk in response.aiter_raw(CHUNK_SIZE):
+                await asyncio.to_thread(f.write, chunk)
+                state.done += len(chunk)
+                state.fetched += len(chunk)
+                if job.bytes_done() > MAX_BYTES:
+                    raise TooLarge(f'Job passed its limit of {MAX_BYTES / 2**20:.0f} MiB')
+                if free_bytes(part) < MIN_FREE_BYTES:
+                    raise TooLarge(f'Less than {MIN_FREE_BYTES / 2**20:.0f} MiB of disk left free')
+
+    if state.total is not None and state.done != state.total:
+        raise LengthMismatch(f'Got {state.done} bytes, expected {state.total}')
+    os.replace(part, state.path)
+
+async def download_file(client, state, gate, semaphore, job):
+    if os.path.exists(state.path):
+        state.status = 'exists'
+        state.done = state.total = os.path.getsize(state.path)
+        return
+    if state.path in active_paths:
+        state.status = 'failed'
+        state.error = 'Already downloading in another job'
+        return
+    active_paths.add(state.path)
+    try:
+        os.makedirs(os.path.dirname(state.path), exist_ok=True)
+        async with gate, semaphore:
+            await _download(client, state, job)
+    finally:
+        active_paths.discard(state.path)
+
+async def _download(client, state, job):
+    state.status = 'downloading'
+    for attempt in range(ATTEMPTS):
+        try:
+            await _fetch(client, state, job)
+            state.status = 'done'
+            state.error = None
+            return
+        except httpx.HTTPStatusError as e:
+            # Client errors will not fix themselves
+            state.error = error_message(e)
+            if e.response.status_code < 500:
+                break
+        except TooLarge as e:
+            # Nothing of it is kept, and retrying would not fit either
+            state.error = str(e)
+            part = state.path + '.part'
+            if os.path.exists(part):
+                os.remove(part)
+            break
+        except (httpx.TransportError, LengthMismatch) as e:
+            state.error = error_message(e) if isinstance(e, httpx.HTTPError) else str(e)
+        if attempt < ATTEMPTS - 1:
+            await asyncio.sleep(0.5 * 2 ** attempt)
+    state.status = 'failed'
+
+class DownloadJob:
+    """A batch of downloads running in the background, polled for progress."""
+
+    def __init__(self, urls, dest=DOWNLOAD_DIR):
+        self.id = uuid.uuid4().hex[:12]
+        self.dest = dest
+        self.files = plan_paths(urls[:MAX_FILES], dest)
+        self.skipped = max(len(urls) - MAX_FILES, 0)
+        self.started = time.monotonic()
+        self.finished = None
+        self.task = None
+
+    @property
+    def running(self):
+        return self.finished is None
+
+    def counts(self):
+        counts = {}
+        for state in self.files:
+            counts[state.status] = counts.get(state.status, 0) + 1
+        return counts
+
+    def bytes_done(self):
+        """Bytes received by this job, not counting data already on disk."""
+        return sum(state.fetched for state in self.files)
+
+    def elapsed(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    async def run(self, client=None):
+        client = client or get_client()
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+        gates = {}
+        tasks = []
+        for state in self.files:
+            gate = gates.setdefault(urlsplit(state.url).hostname, HostGate(PER_HOST, 0))
+            tasks.append(download_file(client, state, gate, semaphore, self))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            self.finished = time.monotonic()
+
+jobs = OrderedDict()
+
+def start_job(urls, dest=DOWNLOAD_DIR):
+    """
+    Start downloading `urls` in the background; returns the DownloadJob.
+    Raises JobRefused while MAX_JOBS jobs are running or the disk holding
+    `dest` has less than MIN_FREE_BYTES free.
+    """
+    if sum(job.running for job in jobs.values()) >= MAX_JOBS:
+        raise JobRefused(f'{MAX_JOBS} of {MAX_JOBS} download jobs are running; try again once one has finished.')
+    if free_bytes(dest) < MIN_FREE_BYTES:
+        raise JobRefused(f'Less than {MIN_FREE_BYTES / 2**20:.0f} MiB of disk is free; '
+                         'clear out old downloads before starting another.')
+    job = DownloadJob(urls, dest)
+    job.task = asyncio.create_task(job.run())
+    jobs[job.id] = job
+    # Forget the oldest finished jobs
+    finished = [i for i, j in jobs.items() if not j.running]
+    for old_id in finished[:max(len(finished) - KEEP_JOBS, 0)]:
+        del jobs[old_id]
+    return job
+
+async def _cli(urls, dest):
+    job = DownloadJob(urls, dest)
+    task = asyncio.create_task(job.run())
+    while not task.done():
+        await asyncio.wait([task], timeout=1)
+        counts = job.counts()
+        done = counts.get('done', 0) + counts.get('exists', 0)
+        print(f"\r{done}/{len(job.files)} files, {counts.get('failed', 0)} failed, "
+              f"{job.bytes_done() / 2**20:.1f} MiB, {job.bytes_done() / 2**20 / job.elapsed():.1f} MiB/s",
+              end='', file=sys.stderr)
+    print(file=sys.stderr)
+    await close_client()
+    for state in job.files:
+        if state.status == 'failed':
+            print(f"FAILED {state.url}: {state.error}", file=sys.stderr)
+    return 1 if job.counts().get('failed') else 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Download links (one per line on stdin or in a file).')
+    parser.add_argument('links', nargs='?', type=argparse.FileType('r'), default=sys.stdin)
+    parser.add_argument('--dest', default=DOWNLOAD_DIR)
+    args = parser.parse_args()
+    urls = [line.strip() for line in args.links if line.strip().startswith(('http://', 'https://'))]
+    sys.exit(asyncio.run(_cli(urls, args.dest)))
+
+if __name__ == '__main__':
+    main()
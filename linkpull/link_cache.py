@@ -0,0 +1,148 @@
+"""
+Cache of extracted link lists per URL: an in-memory LRU in front of a
+SQLite table, each entry carrying the page's ETag / Last-Modified so stale
+entries can be revalidated with a conditional request instead of a re-fetch.
+"""
+
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from fastlite import database, NotFoundError
+
+# Entries younger than FRESH_SECONDS are served without any request; older
+# ones are revalidated, and ones not validated for MAX_AGE seconds are dropped
+FRESH_SECONDS = float(os.environ.get('LINKPULL_CACHE_FRESH', 300))
+MAX_AGE = float(os.environ.get('LINKPULL_CACHE_MAX_AGE', 86400))
+MEMORY_ENTRIES = int(os.environ.get('LINKPULL_CACHE_ENTRIES', 256))
+MEMORY_BYTES = int(os.environ.get('LINKPULL_CACHE_BYTES', 32 * 1024 * 1024))
+DISK_BYTES = int(os.environ.get('LINKPULL_CACHE_DISK_BYTES', 256 * 1024 * 1024))
+# SQLite file for the on-disk tier; empty disables it
+DISK_PATH = os.environ.get('LINKPULL_CACHE_PATH', 'linkpull_cache.db')
+
+class CachedPage:
+    __slots__ = ('links', 'etag', 'last_modified', 'validated_at', 'size')
+
+    def __init__(self, links, etag=None, last_modified=None, validated_at=None):
+        self.links = links
+        self.etag = etag
+        self.last_modified = last_modified
+        self.validated_at = time.time() if validated_at is None else validated_at
+        # Rough in-memory footprint: string payload plus per-object overhead
+        self.size = sum(len(link) for link in links) + 64 * len(links) + 200
+
+    def is_fresh(self):
+        return time.time() - self.validated_at < FRESH_SECONDS
+
+    def is_expired(self):
+        return time.time() - self.validated_at >= MAX_AGE
+
+    def validators(self):
+        """Conditional request headers for revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+_memory = OrderedDict()
+_memory_bytes = 0
+# Guards both tiers; callers may run cache calls in worker threads
+_lock = threading.Lock()
+_pages = None
+
+def _table():
+    """The on-disk table, created on first use; None when disabled."""
+    global _pages
+    if _pages is None and DISK_PATH:
+        db = database(DISK_PATH)
+        _pages = db.t.pages
+        if _pages not in db.t:
+            _pages.create(url=str, links=bytes, etag=str, last_modified=str,
+                          validated_at=float, used_at=float, size=int, pk='url')
+            _pages.create_index(['used_at'])
+    return _pages
+
+def _remember(url, page):
+    """Insert into the memory LRU and evict down to the limits."""
+    global _memory_bytes
+    old = _memory.pop(url, None)
+    if old is not None:
+        _memory_bytes -= old.size
+    _memory[url] = page
+    _memory_bytes += page.size
+    while _memory and (len(_memory) > MEMORY_ENTRIES or _memory_bytes > MEMORY_BYTES):
+        _, evicted = _memory.popitem(last=False)
+        _memory_bytes -= evicted.size
+
+def _forget(url):
+    global _memory_bytes
+    old = _memory.pop(url, None)
+    if old is not None:
+        _memory_bytes -= old.size
+    pages = _table()
+    if pages is not None:
+        try:
+            pages.delete(url)
+        except NotFoundError:
+            pass
+
+def _trim_disk(pages):
+    """Drop expired rows, then least recently used ones over DISK_BYTES."""
+    pages.delete_where('validated_at < ?', [time.time() - MAX_AGE])
+    total = pages.db.q('SELECT COALESCE(SUM(size), 0) AS total FROM pages')[0]['total']
+    if total <= DISK_BYTES:
+        return
+    for row in pages(select='url, size', order_by='used_at'):
+        pages.delete(row['url'])
+        total -= row['size']
+        if total <= DISK_BYTES:
+            break
+
+def get(url):
+    """The cached page for `url`, or None if absent or expired."""
+    with _lock:
+        page = _memory.get(url)
+        if page is None and _table() is not None:
+            try:
+                row = _table()[url]
+            except NotFoundError:
+                row = None
+            if row is not None:
+                page = CachedPage(json.loads(zlib.decompress(row['links'])), row['etag'],
+                                  row['last_modified'], row['validated_at'])
+                _table().update(url=url, used_at=time.time())
+        if page is None:
+            return None
+        if page.is_expired():
+            _forget(url)
+            return None
+        _remember(url, page)
+        return page
+
+def put(url, links, etag=None, last_modified=None):
+    """Cache a freshly extracted link list for `url`."""
+    page = CachedPage(links, etag, last_modified)
+    with _lock:
+        _remember(url, page)
+        pages = _table()
+        if pages is not None:
+            blob = zlib.compress(json.dumps(links).encode(), 6)
+            pages.upsert(dict(url=url, links=blob, etag=etag or '', last_modified=last_modified or '',
+                              validated_at=page.validated_at, used_at=page.validated_at, size=len(blob)))
+            _trim_disk(pages)
+    return page
+
+def revalidated(url, page):
+    """Mark `page` as confirmed current by a 304."""
+    with _lock:
+        page.validated_at = time.time()
+        pages = _table()
+        if pages is not None:
+            try:
+                pages.update(url=url, validated_at=page.validated_at, used_at=page.validated_at)
+            except NotFoundError:
+                pass
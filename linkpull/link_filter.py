@@ -0,0 +1,215 @@
+"""
+Bounded regex filtering of link lists.
+
+Patterns are compiled once and cached. Each is run by the cheapest safe engine:
+  - literal patterns like `.*\\.pdf$` or `\\.(jpg|png)$` become plain
+    startswith / endswith / substring checks;
+  - anything RE2 accepts runs in-process on RE2, which is linear-time;
+  - the rest (backreferences, lookaround) runs on `re` in a worker
+    subprocess that is killed if it exceeds the wall-clock budget.
+
+The budget is per request: a request that filters in several calls (one
+per streamed batch or crawled page) passes the same FilterBudget to each.
+Only time spent in the worker, waiting for it included, is charged; time
+the request spends fetching pages is not.
+"""
+
+import json
+import os
+import re
+import select
+import subprocess
+import sys
+import threading
+import time
+from functools import lru_cache
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+# Seconds one request may spend filtering on the `re` fallback
+TIMEOUT = float(os.environ.get('LINKPULL_REGEX_TIMEOUT', 2.0))
+
+class FilterTimeout(Exception):
+    pass
+
+class FilterBudget:
+    """Seconds a request may still spend on the `re` worker, shared by its filter calls."""
+
+    def __init__(self, seconds=TIMEOUT):
+        self.remaining = seconds
+        self._lock = threading.Lock()
+
+    def spend(self, seconds):
+        with self._lock:
+            self.remaining -= seconds
+
+# One alternation group of literals, e.g. (pdf|docx) or (?:a|b)
+_GROUP = re.compile(r'\((?:\?:)?([^()]*)\)')
+_META = set('.^$*+?{}[]\\|()')
+
+def _unescape(text):
+    """The literal string `text` matches, or None if it has any regex syntax."""
+    out = []
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c == '\\':
+            if i + 1 == len(text) or text[i + 1].isalnum():
+                return None
+            out.append(text[i + 1])
+            i += 2
+            continue
+        if c in _META:
+            return None
+        out.append(c)
+        i += 1
+    return ''.join(out)
+
+def _literals(pattern):
+    """
+    Describe `pattern` as (anchor_start, anchor_end, strings) when it is just
+    literals with at most one alternation group, else None.
+    """
+    start = pattern.startswith('^')
+    body = pattern[1:] if start else pattern
+    end = body.endswith('$') and not body.endswith('\\$')
+    body = body[:-1] if end else body
+    # A leading or trailing .* changes nothing for an unanchored search
+    if not start and body.startswith('.*'):
+        body = body[2:]
+    if not end and body.endswith('.*') and not body.endswith('\\.*'):
+        body = body[:-2]
+
+    groups = list(_GROUP.finditer(body))
+    if len(groups) > 1:
+        return None
+    if groups:
+        group = groups[0]
+        head, tail = _unescape(body[:group.start()]), _unescape(body[group.end():])
+        options = [_unescape(option) for option in group.group(1).split('|')]
+        if head is None or tail is None or None in options:
+            return None
+        strings = [head + option + tail for option in options]
+    else:
+        literal = _unescape(body)
+        if literal is None:
+            return None
+        strings = [literal]
+    return start, end, tuple(strings)
+
+class LinkFilter:
+    """A compiled link pattern; `apply(links)` returns the matching links."""
+
+    def __init__(self, pattern):
+        # Always validate with `re`, so error messages stay the same
+        re.compile(pattern)
+        self.pattern = pattern
+        self.literals = _literals(pattern)
+        self.fast = None
+        if self.literals is None and re2 is not None:
+            options = re2.Options()
+            options.log_errors = False
+            options.never_capture = True
+            try:
+                self.fast = re2.compile(pattern, options)
+            except re2.error:
+                self.fast = None
+
+    @property
+    def engine(self):
+        if self.literals is not None:
+            return 'literal'
+        return 're2' if self.fast is not None else 're'
+
+    def apply(self, links, budget=None):
+        """Matching links; on `re`, raises FilterTimeout once `budget` (a FilterBudget) runs out."""
+        if self.literals is not None:
+            start, end, strings = self.literals
+            if start and end:
+                wanted = set(strings)
+                return [link for link in links if link in wanted]
+            if end:
+                return [link for link in links if link.endswith(strings)]
+            if start:
+                return [link for link in links if link.startswith(strings)]
+            return [link for link in links if any(s in link for s in strings)]
+        if self.fast is not None:
+            search = self.fast.search
+            return [link for link in links if search(link)]
+        return [links[i] for i in _worker.run(self.pattern, links, budget or FilterBudget())]
+
+@lru_cache(maxsize=128)
+def compile_filter(pattern):
+    """Cached LinkFilter for `pattern`; raises re.error if it is invalid."""
+    return LinkFilter(pattern)
+
+def filter_links(links, pattern, budget=None):
+    """Links matching `pattern` (all of them if it is empty)."""
+    if not pattern:
+        return links
+    return compile_filter(pattern).apply(links, budget)
+
+class _Worker:
+    """A `re` subprocess that can be killed mid-match; one job at a time."""
+
+    def __init__(self):
+        self.proc = None
+        self.lock = threading.Lock()
+
+    def _start(self):
+        self.proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--worker'],
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+
+    def _kill(self):
+        self.proc.kill()
+        self.proc.wait()
+        self.proc = None
+
+    def run(self, pattern, links, budget):
+        """Indices of links matching `pattern`, charging the time taken to `budget`."""
+        started = time.monotonic()
+        try:
+            return self._run(pattern, links, started + budget.remaining)
+        finally:
+            budget.spend(time.monotonic() - started)
+
+    def _run(self, pattern, links, deadline):
+        timeout = FilterTimeout(f"Pattern took longer than {TIMEOUT:g} s to match; try a simpler one.")
+        # Other requests' jobs queue ahead of this one on the same budget
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not self.lock.acquire(timeout=remaining):
+            raise timeout
+        try:
+            if self.proc is None or self.proc.poll() is not None:
+                self._start()
+            self.proc.stdin.write(json.dumps({'pattern': pattern, 'links': links}) + '\n')
+            self.proc.stdin.flush()
+            remaining = deadline - time.monotonic()
+            ready = []
+            while remaining > 0 and not ready:
+                ready, _, _ = select.select([self.proc.stdout], [], [], remaining)
+                remaining = deadline - time.monotonic()
+            if not ready:
+                self._kill()
+                raise timeout
+            line = self.proc.stdout.readline()
+            if not line:
+                self._kill()
+                raise FilterTimeout("Pattern matcher exited unexpectedly.")
+            return json.loads(line)
+        finally:
+            self.lock.release()
+
+_worker = _Worker()
+
+def _worker_main():
+    for line in sys.stdin:
+        job = json.loads(line)
+        search = re.compile(job['pattern']).search
+        print(json.dumps([i for i, link in enumerate(job['links']) if search(link)]), flush=True)
+
+if __name__ == '__main__' and sys.argv[1:] == ['--worker']:
+    _worker_main()
@@ -0,0 +1,54 @@
+"""
+Incremental <a href> extraction from HTML arriving in chunks.
+Built on html.parser's tokenizer without a document tree, so memory is the
+parser's unconsumed tail plus the links not yet collected.
+"""
+
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+# Cheap hint that a chunk holds an anchor, used to spot pages the
+# tokenizer swallowed (e.g. an unclosed comment or <script>)
+_ANCHOR_HINT = re.compile(r'<a[\s>]', re.IGNORECASE)
+
+class LinkParser(HTMLParser):
+    """
+    Feed decoded text with feed(); collect absolute links with take().
+    Links resolve against the first <base href>, else the page URL. Being
+    single-pass, a <base> only affects anchors after it; it lives in <head>,
+    so in practice that is all of them.
+    """
+
+    def __init__(self, base_url):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.base_seen = False
+        self.links = []
+        self.anchor_hints = 0
+
+    def feed(self, data):
+        self.anchor_hints += len(_ANCHOR_HINT.findall(data))
+        super().feed(data)
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            for name, value in attrs:
+                if name == 'href':
+                    self.links.append(urljoin(self.base_url, value or ''))
+                    break
+        elif tag == 'base' and not self.base_seen:
+            for name, value in attrs:
+                if name == 'href' and value is not None:
+                    self.base_url = urljoin(self.base_url, value)
+                    self.base_seen = True
+                    break
+
+    def take(self):
+        """Return links found since the last call and forget them."""
+        links, self.links = self.links, []
+        return links
+
+    def suspicious(self, found):
+        """True if `found` links look too few for the anchors seen in the text."""
+        return found == 0 and self.anchor_hints > 0
@@ -1,59 +1,29 @@
 #!/usr/bin/env python3
 from fasthtml.common import *
-import requests
+from contextlib import asynccontextmanager
+from html import escape
+from urllib.parse import urlencode
+import asyncio
+import os
+import json
 import re
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+import zlib
+from starlette.responses import StreamingResponse
+from scraper import scrape_links, close_client, iter_links, error_message
+from crawler import crawl, MAX_DEPTH, MAX_PAGES
+import downloader
+from link_filter import FilterBudget, compile_filter, filter_links
 
-app, rt = fast_app()
+@asynccontextmanager
+async def lifespan(app):
+    # The pooled HTTP client lives for the lifetime of the app
+    yield
+    await close_client()
 
-def scrape_links(url, pat=None):
-    """
-    Scrapes all links on page, optionally accepts regex pattern.
-    Uses requests and BeautifulSoup.
-    Returns tuple: (success, result)
-    - If success: (True, list_of_links)
-    - If error: (False, error_message)
-    """
-    try:
-        # Fetch the content of the URL
-        response = requests.get(url, timeout=10)
-        # Raise an exception for bad status codes (4xx or 5xx)
-        response.raise_for_status()
-
-        # Parse the HTML content using BeautifulSoup
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Find all anchor tags with an href attribute
-        all_links = soup.find_all('a', href=True)
-
-        absolute_links = []
-        for link in all_links:
-            # Convert relative URLs to absolute URLs
-            absolute_link = urljoin(url, link['href'])
-            absolute_links.append(absolute_link)
-
-        if pat:
-            # Filter links based on the provided pattern
-            try:
-                filtered_links = [link for link in absolute_links if re.search(pat, link)]
-                return (True, filtered_links)
-            except re.error as e:
-                return (False, f"Invalid regex pattern: {str(e)}")
-
-        return (True, absolute_links)
-
-    except requests.exceptions.Timeout:
-        return (False, "Request timed out. The server took too long to respond.")
-    except requests.exceptions.ConnectionError:
-        return (False, "Connection error. Could not reach the URL.")
-    except requests.exceptions.HTTPError as e:
-        return (False, f"HTTP error: {e.response.status_code} - {e.response.reason}")
-    except requests.exceptions.RequestException as e:
-        return (False, f"Error during request: {str(e)}")
-    except Exception as e:
-        return (False, f"Unexpected error: {str(e)}")
+app, rt = fast_app(lifespan=lifespan)
 
+# Links shown in the results page; the full list is at /links
+PREVIEW_LINKS = 1000
 
 # JavaScript for copy functionality
 copy_js = """
@@ -74,6 +44,12 @@ function copyToClipboard() {
     }, 2000);
 }
 
+function copyCrawlResults() {
+    const text = document.getElementById('crawlResults').textContent.trim();
+    navigator.clipboard.writeText(text);
+    document.getElementById('copyBtn').textContent = '✓ Copied!';
+}
+
 function showLoading() {
     const resultsDiv = document.getElementById('resultsSection');
     if (resultsDiv) {
@@ -140,14 +116,63 @@ def get():
             Hr(style='margin: 20px 0;'),
             form,
             examples,
+            crawl_form(),
             style='max-width: 800px; margin: 0 auto; padding: 20px; font-family: Arial, sans-serif;'
         ),
         Script(copy_js)
     )
 
 
+def crawl_form(seeds='', pattern='', depth=0, same_host=True):
+    """Batch / crawl form: several seed URLs, optional depth and host restriction"""
+    return Div(
+        H3('Batch / Crawl', style='margin-top: 30px; color: #555;'),
+        Form(
+            Div(
+                Label('Seed URLs (one per line):', style='font-weight: bold; display: block; margin-bottom: 5px;'),
+                Textarea(
+                    seeds,
+                    name='seeds',
+                    rows='5',
+                    required=True,
+                    placeholder='https://example.com/listing?page=1\nhttps://example.com/archive/',
+                    style='width: 100%; padding: 10px; border: 1px solid #ddd; border-radius: 5px; font-family: monospace; font-size: 0.9em;'
+                ),
+                style='margin-bottom: 15px;'
+            ),
+            Div(
+                Label('Regex Pattern (optional):', style='font-weight: bold; display: block; margin-bottom: 5px;'),
+                Input(
+                    type='text',
+                    name='pattern',
+                    value=pattern,
+                    placeholder='.*\\.pdf$ (leave blank for all links)',
+                    style='width: 100%; padding: 10px; border: 1px solid #ddd; border-radius: 5px; font-size: 1em;'
+                ),
+                style='margin-bottom: 15px;'
+            ),
+            Div(
+                Label('Depth: ', Input(type='number', name='depth', value=depth, min='0', max=str(MAX_DEPTH),
+                                       style='width: 5em; padding: 5px;'),
+                      style='margin-right: 20px;'),
+                Label(Input(type='checkbox', name='same_host', checked=same_host), ' Stay on the seed hosts'),
+                style='margin-bottom: 15px; display: flex; align-items: center;'
+            ),
+            Button(
+                '🕸 Crawl',
+                type='submit',
+                style='width: 100%; padding: 12px; background-color: #007bff; color: white; border: none; border-radius: 5px; cursor: pointer; font-size: 1.1em; font-weight: bold;'
+            ),
+            method='post',
+            action='/linkpull/crawl'
+        ),
+        P(f'Depth 0 reads just the seeds; each level follows page links found on the previous one '
+          f'(at most {MAX_PAGES} pages per crawl).', style='color: #666; font-size: 0.9em;'),
+    )
+
+
 @rt('/extract')
-def post(url: str, pattern: str = None):
+async def post(url: str, pattern: str = None):
     """Process the URL and extract links"""
 
     # Clean up inputs
@@ -159,17 +184,22 @@ def post(url: str, pattern: str = None):
         url = 'https://' + url
 
     # Extract links
-    success, result = scrape_links(url, pattern)
+    success, result = await scrape_links(url, pattern)
 
     if success:
         links = result
-        links_text = '\n'.join(links)
         count = len(links)
+        links_text = '\n'.join(links[:PREVIEW_LINKS])
+        query = urlencode({'url': url, 'pattern': pattern or ''})
 
         # Results section
         results_section = Div(
             H3(f'✓ Found {count} matching link{"s" if count != 1 else ""}',
                style='color: #28a745; margin-bottom: 15px;'),
+            P(f'Showing the first {PREVIEW_LINKS}. Full list: ',
+              A('plain text', href=f'/linkpull/links?{query}'), ' · ',
+              A('NDJSON', href=f'/linkpull/links?{query}&format=ndjson'),
+              style='color: #666;') if count > PREVIEW_LINKS else None,
             Div(
                 Textarea(
                     links_text,
@@ -179,11 +209,23 @@ def post(url: str, pattern: str = None):
                     style='width: 100%; padding: 10px; border: 1px solid #ddd; border-radius: 5px; font-family: monospace; font-size: 0.9em; resize: vertical;'
                 ),
                 Button(
-                    '📋 Copy All Links',
+                    '📋 Copy All Links' if count <= PREVIEW_LINKS else f'📋 Copy First {PREVIEW_LINKS} Links',
                     id='copyBtn',
                     onclick='copyToClipboard()',
                     style='margin-top: 10px; padding: 10px 20px; background-color: #007bff; color: white; border: none; border-radius: 5px; cursor: pointer; font-size: 1em;'
                 ) if count > 0 else None,
+                Form(
+                    Hidden(name='url', value=url),
+                    Hidden(name='pattern', value=pattern or ''),
+                    Button(
+                        f'⬇ Download {min(count, downloader.MAX_FILES)} File{"s" if count != 1 else ""} to Server',
+                        type='submit',
+                        style='margin-top: 10px; padding: 10px 20px; background-color: #28a745; color: white; border: none; border-radius: 5px; cursor: pointer; font-size: 1em;'
+                    ),
+                    method='post',
+                    action='/linkpull/download',
+                    style='display: inline; margin-left: 10px;'
+                ) if count > 0 else None,
                 style='margin-top: 10px;'
             ),
             id='resultsSection',
@@ -251,5 +293,270 @@ def post(url: str, pattern: str = None):
     )
 
 
+@rt('/links')
+async def get(req, url: str, pattern: str = None, format: str = 'text'):
+    """
+    Stream matching links for scripts: one URL per line (text/plain), or
+    one {"url": ...} object per line with format=ndjson. Gzipped when the
+    client accepts it. A failure after streaming has begun ends a text
+    response early; NDJSON gets a final {"error": ...} line.
+    """
+    url = url.strip()
+    pattern = pattern.strip() if pattern else None
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    if format not in ('text', 'ndjson'):
+        return Response('format must be text or ndjson\n', status_code=400, media_type='text/plain')
+    if pattern:
+        try:
+            compile_filter(pattern)
+        except re.error as e:
+            return Response(f"Invalid regex pattern: {str(e)}\n", status_code=400, media_type='text/plain')
+
+    ndjson = format == 'ndjson'
+    loop = asyncio.get_running_loop()
+    batches = iter_links(url)
+    # Fetch the first batch before answering so fetch errors get a real status
+    try:
+        first = await anext(batches, [])
+    except Exception as e:
+        await batches.aclose()
+        return Response(error_message(e) + '\n', status_code=502, media_type='text/plain')
+
+    def encode(links):
+        if ndjson:
+            return ''.join(json.dumps({'url': link}) + '\n' for link in links)
+        return ''.join(link + '\n' for link in links)
+
+    async def lines():
+        batch = first
+        # One regex budget for the whole response, not one per batch
+        budget = FilterBudget()
+        try:
+            while True:
+                if pattern:
+                    batch = await loop.run_in_executor(None, filter_links, batch, pattern, budget)
+                if batch:
+                    yield encode(batch).encode()
+                batch = await anext(batches, None)
+                if batch is None:
+                    break
+        except Exception as e:
+            print(f"/links {url} failed mid-stream: {error_message(e)}")
+            if ndjson:
+                yield (json.dumps({'error': error_message(e)}) + '\n').encode()
+        finally:
+            await batches.aclose()
+
+    async def gzipped(chunks):
+        # Sync-flush each batch so lines arrive as they are extracted
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        async for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+    headers = {'X-Accel-Buffering': 'no', 'Vary': 'Accept-Encoding'}
+    body = lines()
+    if 'gzip' in req.headers.get('accept-encoding', ''):
+        headers['Content-Encoding'] = 'gzip'
+        body = gzipped(body)
+    media_type = 'application/x-ndjson' if ndjson else 'text/plain; charset=utf-8'
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+
+@rt('/download')
+async def post(url: str, pattern: str = None):
+    """Start downloading the links matched by `url` and `pattern` (the cached extraction)"""
+    success, result = await scrape_links(url.strip(), pattern.strip() if pattern else None)
+    if success:
+        try:
+            job = downloader.start_job(result)
+            return RedirectResponse(f'/linkpull/downloads/{job.id}', status_code=303)
+        except downloader.JobRefused as e:
+            result = str(e)
+    return Titled('LinkPull - Download',
+        Div(
+            H3('✗ Error', style='color: #dc3545; margin-bottom: 10px;'),
+            P(result, style='color: #666;'),
+            A('← Start New Search', href='/linkpull'),
+            style='max-width: 800px; margin: 0 auto; padding: 20px; font-family: Arial, sans-serif;'
+        )
+    )
+
+
+def download_progress(job):
+    """Progress panel for a download job; polls itself while the job runs"""
+    counts = job.counts()
+    finished = counts.get('done', 0) + counts.get('exists', 0)
+    total = len(job.files)
+    mib = job.bytes_done() / 2**20
+    # Only rows worth looking at: in progress first, then failures
+    rows = [f for f in job.files if f.status == 'downloading'] + [f for f in job.files if f.status == 'failed']
+
+    def row(state):
+        if state.status == 'failed':
+            detail = state.error or 'failed'
+        elif state.total:
+            detail = f'{state.done / 2**20:.1f} / {state.total / 2**20:.1f} MiB'
+        else:
+            detail = f'{state.done / 2**20:.1f} MiB'
+        return Tr(Td(Code(os.path.basename(state.path))), Td(state.status), Td(detail))
+
+    return Div(
+        H3(('⏳ Downloading' if job.running else '✓ Finished') + f': {finished} of {total} files',
+           style='color: #555;' if job.running else 'color: #28a745;'),
+        Progress(value=str(finished + counts.get('failed', 0)), max=str(total), style='width: 100%;'),
+        P(f'{mib:.1f} MiB in {job.elapsed():.0f} s ({mib / max(job.elapsed(), 0.001):.1f} MiB/s) · '
+          f'{counts.get("exists", 0)} already present · {counts.get("failed", 0)} failed · saved under ',
+          Code(os.path.abspath(job.dest)), style='color: #666;'),
+        P(f'{job.skipped} links beyond the {downloader.MAX_FILES}-file limit were skipped.',
+          style='color: #dc3545;') if job.skipped else None,
+        Table(*[row(state) for state in rows[:50]], style='font-size: 0.9em;') if rows else None,
+        id='downloadProgress',
+        hx_get=f'/linkpull/downloads/{job.id}/progress' if job.running else None,
+        hx_trigger='every 1s' if job.running else None,
+        hx_swap='outerHTML',
+    )
+
+
+@rt('/downloads/{job_id}')
+def get(job_id: str):
+    """Download job page"""
+    job = downloader.jobs.get(job_id)
+    if job is None:
+        return Response('Unknown download job', status_code=404)
+    return Titled('LinkPull - Download',
+        Div(
+            H1('🔗 LinkPull', style='color: #007bff; margin-bottom: 10px;'),
+            Hr(style='margin: 20px 0;'),
+            download_progress(job),
+            Div(
+                A('← Start New Search', href='/linkpull',
+                  style='display: inline-block; margin-top: 20px; padding: 10px 20px; background-color: #6c757d; color: white; text-decoration: none; border-radius: 5px;'),
+                style='text-align: center;'
+            ),
+            style='max-width: 800px; margin: 0 auto; padding: 20px; font-family: Arial, sans-serif;'
+        )
+    )
+
+
+@rt('/downloads/{job_id}/progress')
+def get(job_id: str):
+    """HTMX fragment polled by the download job page"""
+    job = downloader.jobs.get(job_id)
+    if job is None:
+        return Response('Unknown download job', status_code=404)
+    return download_progress(job)
+
+
+# Placeholders split the crawl results page into the parts streamed around the links
+LINKS_MARK = '@@crawl-links@@'
+SUMMARY_MARK = '@@crawl-summary@@'
+
+@rt('/crawl')
+async def post(req, seeds: str, pattern: str = None, depth: int = 0, same_host: bool = False):
+    """Crawl several seed URLs, streaming links back as each page finishes"""
+
+    pattern = pattern.strip() if pattern else None
+    depth = max(0, min(depth, MAX_DEPTH))
+    seed_urls = []
+    for line in seeds.splitlines():
+        line = line.strip()
+        if line:
+            seed_urls.append(line if line.startswith(('http://', 'https://')) else 'https://' + line)
+
+    error = None
+    if not seed_urls:
+        error = 'No seed URLs given.'
+    elif pattern:
+        try:
+            compile_filter(pattern)
+        except re.error as e:
+            error = f"Invalid regex pattern: {str(e)}"
+
+    header = (
+        H1('🔗 LinkPull', style='color: #007bff; margin-bottom: 10px;'),
+        P('Extract and filter URLs from any webpage', style='color: #666; font-size: 1.1em;'),
+        Hr(style='margin: 20px 0;'),
+        crawl_form('\n'.join(seed_urls), pattern or '', depth, same_host),
+    )
+    footer = Div(
+        A('← Start New Search', href='/linkpull',
+          style='display: inline-block; margin-top: 20px; padding: 10px 20px; background-color: #6c757d; color: white; text-decoration: none; border-radius: 5px;'),
+        style='text-align: center;'
+    )
+
+    if error:
+        return Titled('LinkPull - Crawl',
+            Div(
+                *header,
+                Div(
+                    H3('✗ Error', style='color: #dc3545; margin-bottom: 10px;'),
+                    P(error, style='color: #666;'),
+                    style='margin-top: 30px; padding: 20px; background-color: #fff3cd; border-radius: 5px; border: 1px solid #ffc107;'
+                ),
+                footer,
+                style='max-width: 800px; margin: 0 auto; padding: 20px; font-family: Arial, sans-serif;'
+            ),
+            Script(copy_js)
+        )
+
+    results_section = Div(
+        H3(f'Crawling {len(seed_urls)} seed{"s" if len(seed_urls) != 1 else ""}, depth {depth}',
+           style='color: #555; margin-bottom: 15px;'),
+        Pre(LINKS_MARK, id='crawlResults',
+            style='max-height: 30em; overflow: auto; padding: 10px; border: 1px solid #ddd; border-radius: 5px; background: white; font-size: 0.9em;'),
+        Div(SUMMARY_MARK),
+        id='resultsSection',
+        style='margin-top: 30px; padding: 20px; background-color: #f9f9f9; border-radius: 5px; border: 1px solid #ddd;'
+    )
+    title, main = Titled('LinkPull - Crawl',
+        Div(
+            *header,
+            results_section,
+            footer,
+            style='max-width: 800px; margin: 0 auto; padding: 20px; font-family: Arial, sans-serif;'
+        ),
+        Script(copy_js)
+    )
+    page = to_xml(respond(req, [title], main))
+    head, rest = page.split(LINKS_MARK)
+    middle, tail = rest.split(SUMMARY_MARK)
+
+    async def stream():
+        yield head
+        pages, count, errors = 0, 0, []
+        async for kind, url, result in crawl(seed_urls, pattern, depth, same_host):
+            if kind == 'error':
+                errors.append((url, result))
+                continue
+            pages += 1
+            count += len(result)
+            if result:
+                yield ''.join(escape(link) + '\n' for link in result)
+        yield middle
+        summary = Div(
+            H3(f'✓ Found {count} matching link{"s" if count != 1 else ""} on {pages} page{"s" if pages != 1 else ""}',
+               style='color: #28a745; margin: 15px 0;'),
+            Button(
+                '📋 Copy All Links',
+                id='copyBtn',
+                onclick='copyCrawlResults()',
+                style='padding: 10px 20px; background-color: #007bff; color: white; border: none; border-radius: 5px; cursor: pointer; font-size: 1em;'
+            ) if count > 0 else None,
+            Details(
+                Summary(f'{len(errors)} page{"s" if len(errors) != 1 else ""} failed'),
+                Ul(*[Li(Code(url), f' - {message}') for url, message in errors]),
+                style='margin-top: 15px; color: #666;'
+            ) if errors else None,
+        )
+        yield to_xml(summary)
+        yield tail
+
+    # X-Accel-Buffering stops nginx from holding the stream until it ends
+    return StreamingResponse(stream(), media_type='text/html; charset=utf-8',
+                             headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+
 if __name__ == '__main__':
     serve(host='0.0.0.0', port=8743)
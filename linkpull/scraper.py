@@ -0,0 +1,174 @@
+import asyncio
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+import httpx
+from bs4 import BeautifulSoup
+from link_parser import LinkParser
+import link_cache
+from link_filter import filter_links, FilterTimeout
+
+# Shared HTTP client limits, and threads available for HTML parsing
+MAX_CONNECTIONS = int(os.environ.get('LINKPULL_MAX_CONNECTIONS', 50))
+PARSE_WORKERS = int(os.environ.get('LINKPULL_PARSE_WORKERS', 2))
+FETCH_TIMEOUT = 10.0
+# Bodies up to this size are kept so a BeautifulSoup re-parse is possible
+# when the streaming parser fails; larger pages are parsed streaming only
+FALLBACK_BYTES = int(os.environ.get('LINKPULL_FALLBACK_BYTES', 8 * 1024 * 1024))
+
+_client = None
+_parse_pool = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix='linkpull-parse')
+
+def get_client():
+    """Return the process-wide pooled client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=FETCH_TIMEOUT,
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=10),
+            follow_redirects=True,
+        )
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def _soup_features():
+    try:
+        import lxml  # noqa: F401
+        return 'lxml'
+    except ImportError:
+        return 'html.parser'
+
+def extract_links(html, base_url):
+    """Parse a whole HTML document and return every <a href> as an absolute URL."""
+    # Parse the HTML content using BeautifulSoup
+    soup = BeautifulSoup(html, _soup_features())
+
+    base = soup.find('base', href=True)
+    if base:
+        base_url = urljoin(base_url, base['href'])
+
+    # Convert relative URLs to absolute URLs
+    return [urljoin(base_url, link['href']) for link in soup.find_all('a', href=True)]
+
+async def stream_links(response):
+    """
+    Yield batches of links from a streamed httpx response as its chunks
+    arrive. Falls back to BeautifulSoup on the kept body if the tokenizer
+    fails or finds nothing on a page that clearly has anchors; only links
+    past those already yielded come from the fallback.
+    """
+    loop = asyncio.get_running_loop()
+    parser = LinkParser(str(response.url))
+    yielded = 0
+    kept, kept_chars = [], 0
+    try:
+        async for text in response.aiter_text():
+            if kept is not None:
+                kept_chars += len(text)
+                if kept_chars <= FALLBACK_BYTES:
+                    kept.append(text)
+                else:
+                    kept = None
+            await loop.run_in_executor(_parse_pool, parser.feed, text)
+            batch = parser.take()
+            if batch:
+                yielded += len(batch)
+                yield batch
+        await loop.run_in_executor(_parse_pool, parser.close)
+        batch = parser.take()
+        if batch:
+            yielded += len(batch)
+            yield batch
+        if kept is None or not parser.suspicious(yielded):
+            return
+    except (AssertionError, ValueError) as e:
+        if kept is None:
+            raise
+        print(f"Streaming parse of {response.url} failed ({e}), re-parsing with BeautifulSoup")
+    links = await loop.run_in_executor(_parse_pool, extract_links, ''.join(kept), str(response.url))
+    if links[yielded:]:
+        yield links[yielded:]
+
+async def iter_links(url, html_only=False):
+    """
+    Yield batches of absolute links on the page at `url` as they are
+    extracted, via the link cache: fresh entries cost nothing, stale ones a
+    conditional request, and only a changed page is downloaded and parsed
+    again. With `html_only`, non-HTML responses yield no links and are not
+    cached.
+    """
+    loop = asyncio.get_running_loop()
+    cached = await loop.run_in_executor(None, link_cache.get, url)
+    if cached is not None and cached.is_fresh():
+        yield cached.links
+        return
+
+    headers = cached.validators() if cached is not None else {}
+    links = []
+    async with get_client().stream('GET', url, headers=headers) as response:
+        if response.status_code == 304 and cached is not None:
+            await loop.run_in_executor(None, link_cache.revalidated, url, cached)
+            yield cached.links
+            return
+        # Raise an exception for bad status codes (4xx or 5xx)
+        response.raise_for_status()
+        if html_only and 'html' not in response.headers.get('content-type', 'text/html'):
+            return
+        async for batch in stream_links(response):
+            links.extend(batch)
+            yield batch
+
+    if 'no-store' not in response.headers.get('cache-control', ''):
+        await loop.run_in_executor(None, link_cache.put, url, links,
+                                   response.headers.get('etag'), response.headers.get('last-modified'))
+
+async def fetch_links(url, html_only=False):
+    """All absolute links on the page at `url`; see iter_links."""
+    links = []
+    async for batch in iter_links(url, html_only):
+        links.extend(batch)
+    return links
+
+def error_message(e):
+    """User-facing message for an exception raised while fetching a page."""
+    if isinstance(e, FilterTimeout):
+        return str(e)
+    if isinstance(e, httpx.TimeoutException):
+        return "Request timed out. The server took too long to respond."
+    if isinstance(e, httpx.ConnectError):
+        return "Connection error. Could not reach the URL."
+    if isinstance(e, httpx.HTTPStatusError):
+        return f"HTTP error: {e.response.status_code} - {e.response.reason_phrase}"
+    if isinstance(e, httpx.HTTPError):
+        return f"Error during request: {str(e)}"
+    return f"Unexpected error: {str(e)}"
+
+async def scrape_links(url, pat=None):
+    """
+    Scrapes all links on page, optionally accepts regex pattern.
+    Fetches with the shared httpx client and extracts links from the body
+    as it streams in, parsing in a bounded thread pool so neither blocks
+    the event loop. Link lists are cached, so re-running a URL with a new
+    pattern only re-filters.
+    Returns tuple: (success, result)
+    - If success: (True, list_of_links)
+    - If error: (False, error_message)
+    """
+    try:
+        absolute_links = await fetch_links(url)
+
+        try:
+            # Off the event loop: a slow pattern may wait out its time budget
+            loop = asyncio.get_running_loop()
+            return (True, await loop.run_in_executor(None, filter_links, absolute_links, pat))
+        except re.error as e:
+            return (False, f"Invalid regex pattern: {str(e)}")
+
+    except Exception as e:
+        return (False, error_message(e))
@@ -1,20 +1,113 @@
+import sys
+from pathlib import Path
 from fasthtml.common import *
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.bulk import BadImport, add_import_route, bulk_section, export_response, import_request, is_form
+from common.db import create_table, open_db
+from common.offline import (apply_batch, batch_response, client_script, current_rows, service_worker,
+                            sync_migration, utc_now)
+from common.search import SEARCH_LIMIT, fts_migration, marked, search, search_form
+
+MIGRATIONS = [
+    create_table('menu_items', id=int, content=str, created_at=str, pk='id'),
+    fts_migration('menu_items'),
+    sync_migration('menu_items'),
+]
+
 # Initialize the database
-db = database('menu.db')
+db = open_db('menu.db', MIGRATIONS)
 menu_items = db.t.menu_items
-if menu_items not in db.t:
-    menu_items.create(id=int, content=str, created_at=str, pk='id')
 MenuItem = menu_items.dataclass()
 
+# Items per page; further pages load as the end of the list scrolls into view
+PAGE_SIZE = 50
+# Columns that syncs and imports may set, with their allowed values (None: any text)
+FIELDS = {'content': None}
+EXPORT_COLUMNS = ['id', 'content', 'created_at', 'updated_at']
+
 # Create the FastHTML app
 app, rt = fast_app()
 
+def menu_card(item):
+    """A single menu item card with edit and delete actions"""
+    return Div(
+        P(Strong(f"Item #{item.id}"), style='margin: 0; color: #666; font-size: 0.9em;'),
+        P(item.content, cls='content', style='margin: 10px 0;'),
+        Div(
+            Form(
+                Button('Edit', type='submit',
+                       style='padding: 4px 12px; background-color: #28a745; color: white; border: none; cursor: pointer; margin-right: 8px;'),
+                method='get',
+                action=f'/menu/edit/{item.id}',
+                style='display: inline;'
+            ),
+            Form(
+                Button('Delete', type='submit',
+                       style='padding: 4px 12px; background-color: #dc3545; color: white; border: none; cursor: pointer;'),
+                method='post',
+                action=f'/menu/delete/{item.id}',
+                style='display: inline;'
+            ),
+            style='display: flex; gap: 8px;'
+        ),
+        id=f'item-{item.id}',
+        style='border: 1px solid #ddd; padding: 15px; margin-bottom: 15px; border-radius: 5px; background-color: #f9f9f9;'
+    )
+
+# Actions the page queues while offline and sends to /sync in batches;
+# the edit page needs the network, so offline an item is edited in a prompt
+OFFLINE_SCRIPT = client_script('/menu', 'item-', '#menu-items', {
+    'add': {'op': 'add'},
+    'edit': {'op': 'set', 'prompt': True},
+    'update': {'op': 'set', 'back': True},
+    'delete': {'op': 'delete'},
+})
+
+def items_page(before=None):
+    """Up to PAGE_SIZE items with id below `before`, newest first, plus the id
+    to continue from (None on the last page)"""
+    if before is None:
+        rows = menu_items(order_by='id DESC', limit=PAGE_SIZE + 1)
+    else:
+        rows = menu_items(where='id < ?', where_args=[before], order_by='id DESC', limit=PAGE_SIZE + 1)
+    return rows[:PAGE_SIZE], (rows[PAGE_SIZE - 1].id if len(rows) > PAGE_SIZE else None)
+
+def item_list(before=None):
+    """One page of cards followed by a loader for the next page, if any"""
+    rows, next_before = items_page(before)
+    return (*[menu_card(item) for item in rows], load_more(next_before) if next_before else None)
+
+def load_more(before):
+    """Link to the next page; with HTMX it replaces itself with that page once scrolled into view"""
+    url = f'/menu/page?before={before}'
+    return A('Load more items', href=url,
+             hx_get=url, hx_trigger='revealed, click', hx_target='this', hx_swap='outerHTML',
+             style='display: block; padding: 10px; text-align: center; color: #666;')
+
+def search_items(q, limit=SEARCH_LIMIT):
+    """Best-ranked menu items matching `q` as (id, highlighted content) rows (see common/search.py)"""
+    return search(db, 'menu_items', q, limit=limit)
+
+def search_results(q):
+    """Ranked matches for `q` with the matching words highlighted"""
+    if not q.strip():
+        return ''
+    rows = search_items(q)
+    if not rows:
+        return P('No matching menu items.', style='color: #666;')
+    return Div(
+        *[Div(
+            P(Strong(f"Item #{row_id}"), ' ', A('Edit', href=f'/menu/edit/{row_id}'),
+              style='margin: 0; color: #666; font-size: 0.9em;'),
+            P(*marked(text), style='margin: 6px 0 0;'),
+            style='border-left: 3px solid #007bff; padding: 6px 12px; margin-bottom: 10px;'
+        ) for row_id, text in rows],
+        style='margin-bottom: 20px;'
+    )
+
 @rt('/')
 def get():
-    # Get all menu items
-    all_items = menu_items(order_by='id DESC')
-
     # Create the form for new menu items
     form = Form(
         Textarea(name='content', placeholder='Enter menu item...', rows=4,
@@ -32,44 +125,76 @@ def get():
         style='display: flex; gap: 20px; margin-bottom: 20px; align-items: flex-start;'
     )
 
-    # Display existing menu items
+    # Search box, with results shown above the lists
+    search_section = Div(search_form('/menu', 'Search menu items...'), Div(id='search-results'))
+
+    # Display the newest menu items; older ones load page by page
     items_list = Div(
-        *[Div(
-            P(Strong(f"Item #{item.id}"), style='margin: 0; color: #666; font-size: 0.9em;'),
-            P(item.content, style='margin: 10px 0;'),
-            Div(
-                Form(
-                    Button('Edit', type='submit',
-                           style='padding: 4px 12px; background-color: #28a745; color: white; border: none; cursor: pointer; margin-right: 8px;'),
-                    method='get',
-                    action=f'/menu/edit/{item.id}',
-                    style='display: inline;'
-                ),
-                Form(
-                    Button('Delete', type='submit',
-                           style='padding: 4px 12px; background-color: #dc3545; color: white; border: none; cursor: pointer;'),
-                    method='post',
-                    action=f'/menu/delete/{item.id}',
-                    style='display: inline;'
-                ),
-                style='display: flex; gap: 8px;'
-            ),
-            style='border: 1px solid #ddd; padding: 15px; margin-bottom: 15px; border-radius: 5px; background-color: #f9f9f9;'
-        ) for item in all_items],
+        *item_list(),
+        id='menu-items',
         style='margin-top: 20px;'
     )
 
     return Titled('Lal-Zhao Family Menu',
         top_section,
+        bulk_section('/menu'),
+        search_section,
         items_list,
+        Script(OFFLINE_SCRIPT),
+        style='max-width: 1000px; margin: 0 auto; padding: 20px; font-family: Arial, sans-serif;'
+    )
+
+@rt('/page')
+def get(before: int):
+    """A further page of items; a bare fragment for HTMX, a plain page otherwise"""
+    return item_list(before)
+
+@rt('/search')
+def get(htmx: HtmxHeaders, q: str = ''):
+    """Search results: the fragment for HTMX, a page with the search box otherwise"""
+    if htmx.request:
+        return search_results(q)
+    return Titled('Search menu items',
+        search_form('/menu', 'Search menu items...', q),
+        Div(search_results(q), id='search-results'),
+        A('Back to the list', href='/menu'),
         style='max-width: 1000px; margin: 0 auto; padding: 20px; font-family: Arial, sans-serif;'
     )
 
+async def import_items(req):
+    """Add many items at once: a list pasted on the page, or a text, CSV or JSON body (see common/bulk.py)"""
+    try:
+        count = await import_request(req, db, 'menu_items', FIELDS)
+    except BadImport as e:
+        return Response(str(e), status_code=400)
+    if is_form(req):
+        return RedirectResponse('/menu', status_code=303)
+    return JSONResponse({'imported': count})
+
+add_import_route(app, '/import', import_items)
+
+@rt('/export')
+def get(format: str = 'csv'):
+    """The whole table as a streamed CSV or JSON download"""
+    if format not in ('csv', 'json'):
+        return Response('Unknown format', status_code=404)
+    return export_response(db, 'menu_items', EXPORT_COLUMNS, format, 'menu')
+
+@rt('/service-worker')
+def get():
+    return service_worker('/menu')
+
+@rt('/sync', methods=['post'])
+def post(ops: list[dict] = None):
+    """Apply a batch of operations queued by the page, in one transaction"""
+    results = apply_batch(db, 'menu_items', ops or [], FIELDS)
+    return batch_response(results, current_rows(menu_items, results), menu_card)
+
 @rt('/add', methods=['post'])
 def post(content: str):
     from datetime import datetime
     if content.strip():
-        menu_items.insert(content=content, created_at=datetime.now().isoformat())
+        menu_items.insert(content=content, created_at=datetime.now().isoformat(), updated_at=utc_now())
     return RedirectResponse('/menu', status_code=303)
 
 @rt('/edit/{item_id}')
@@ -94,13 +219,14 @@ def edit(item_id: int):
 
     return Titled(f'Edit Item #{item_id}',
         edit_form,
+        Script(OFFLINE_SCRIPT),
         style='max-width: 600px; margin: 0 auto; padding: 20px; font-family: Arial, sans-serif;'
     )
 
 @rt('/update/{item_id}', methods=['post'])
 def update(item_id: int, content: str):
     if content.strip():
-        menu_items.update(id=item_id, content=content)
+        menu_items.update(id=item_id, content=content, updated_at=utc_now())
     return RedirectResponse('/menu', status_code=303)
 
 @rt('/delete/{item_id}', methods=['post'])
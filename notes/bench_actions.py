@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Bytes and server time per notes action: the no-JS path (POST, 303, then
+the full page) against the HTMX path (POST returning just the fragment).
+
+Runs the app in-process with Starlette's TestClient against a throwaway
+database in a temp directory, seeded with --active and --archived notes.
+
+    python bench_actions.py [--active 30] [--archived 300] [--rounds 20]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+def measure(client, method, path, htmx, **kwargs):
+    """(body bytes, seconds) for one action, following the redirect without HTMX."""
+    headers = {'HX-Request': 'true'} if htmx else {}
+    start = time.perf_counter()
+    response = client.request(method, path, headers=headers, follow_redirects=False, **kwargs)
+    size = len(response.content)
+    if response.status_code == 303:
+        page = client.get(response.headers['location'].removeprefix('/notes') or '/')
+        size += len(page.content)
+    return size, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark notes actions with and without HTMX.')
+    parser.add_argument('--active', type=int, default=30)
+    parser.add_argument('--archived', type=int, default=300)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(tempfile.mkdtemp(prefix='notes-bench-'))
+    sys.path.insert(0, here)
+    import main as notes_app
+    from starlette.testclient import TestClient
+
+    for i in range(args.archived):
+        notes_app.notes.insert(content=f'Archived item {i}: 2 x oat milk', created_at='2024-01-01', status='archived')
+    for i in range(args.active):
+        notes_app.notes.insert(content=f'Active item {i}: bananas', created_at='2024-01-01', status='active')
+    client = TestClient(notes_app.app)
+
+    print(f"{args.active} active / {args.archived} archived notes, {args.rounds} rounds, means per action")
+    print(f"{'action':10} | {'no-JS bytes':>11} | {'HTMX bytes':>10} | {'no-JS ms':>8} | {'HTMX ms':>7}")
+    for action in ('add', 'archive', 'activate', 'delete'):
+        results = {}
+        for htmx in (False, True):
+            sizes, times = [], []
+            for _ in range(args.rounds):
+                # Each round works on a fresh note so every action is valid
+                note = notes_app.notes.insert(content='Bench item: coffee', created_at='2024-01-01',
+                                              status='archived' if action == 'activate' else 'active')
+                if action == 'add':
+                    size, elapsed = measure(client, 'POST', '/add', htmx, data={'content': 'Bench item: tea'})
+                else:
+                    size, elapsed = measure(client, 'POST', f'/{action}/{note.id}', htmx)
+                sizes.append(size)
+                times.append(elapsed)
+                # Keep the lists at their seeded size
+                for row in notes_app.notes(where='content LIKE ?', where_args=['Bench item:%']):
+                    notes_app.notes.delete(row.id)
+            results[htmx] = statistics.mean(sizes), statistics.median(times) * 1000
+        print(f"{action:10} | {results[False][0]:11.0f} | {results[True][0]:10.0f} | "
+              f"{results[False][1]:8.2f} | {results[True][1]:7.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Bulk import and export (common/bulk.py) against the one-item-at-a-time
+path, at --rows sizes.
+
+Runs the notes app in-process with Starlette's TestClient against a
+throwaway database in a temp directory:
+  - per item: POST /add for each row (insert plus redirect, the redirect
+    not followed); past --sample rows the rate of the first --sample is
+    extrapolated
+  - import: one POST /import of the rows as newline-separated text
+  - export: GET /export as CSV, streamed, against building the same CSV
+    from one fetchall, with peak Python memory for each (tracemalloc)
+
+    python bench_bulk.py [--rows 1000 100000] [--sample 2000]
+"""
+
+import argparse
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+def peak_memory(fn):
+    """(result, peak traced MiB) of fn()."""
+    tracemalloc.start()
+    try:
+        result = fn()
+        return result, tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark bulk import and export in the notes app.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 100_000])
+    parser.add_argument('--sample', type=int, default=2000, help='most rows added one by one before extrapolating')
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(tempfile.mkdtemp(prefix='bulk-bench-'))
+    sys.path.insert(0, here)
+    import main as notes_app
+    from common.bulk import export_csv
+    from starlette.testclient import TestClient
+    client = TestClient(notes_app.app)
+
+    def clear():
+        with notes_app.db.conn:
+            notes_app.db.execute('DELETE FROM notes')
+
+    def fetchall_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(notes_app.EXPORT_COLUMNS)
+        writer.writerows(notes_app.db.execute(f"SELECT {', '.join(notes_app.EXPORT_COLUMNS)} FROM notes ORDER BY id"))
+        return len(buffer.getvalue())
+
+    def streamed_csv():
+        return sum(len(chunk) for chunk in export_csv(notes_app.db, 'notes', notes_app.EXPORT_COLUMNS))
+
+    print(f"{'rows':>7} | {'per item s':>10} | {'import s':>8} | {'speedup':>7} | "
+          f"{'export s':>8} | {'MB/s':>5} | {'streamed peak':>13} | {'fetchall peak':>13}")
+    for rows in args.rows:
+        lines = [f'Bench item {i}: {"oat milk" if i % 2 else "bananas"}' for i in range(rows)]
+
+        clear()
+        sample = min(rows, args.sample)
+        start = time.perf_counter()
+        for line in lines[:sample]:
+            client.post('/add', data={'content': line}, follow_redirects=False)
+        one_by_one = (time.perf_counter() - start) * rows / sample
+        estimated = '~' if sample < rows else ' '
+
+        clear()
+        start = time.perf_counter()
+        response = client.post('/import', content='\n'.join(lines), headers={'Content-Type': 'text/plain'})
+        imported = time.perf_counter() - start
+        assert response.json() == {'imported': rows}
+
+        start = time.perf_counter()
+        response = client.get('/export?format=csv')
+        exported = time.perf_counter() - start
+        streamed_size, streamed_peak = peak_memory(streamed_csv)
+        fetchall_size, fetchall_peak = peak_memory(fetchall_csv)
+        assert len(response.text) == streamed_size == fetchall_size
+
+        print(f"{rows:7} | {estimated}{one_by_one:9.2f} | {imported:8.2f} | {one_by_one / imported:6.0f}x | "
+              f"{exported:8.2f} | {len(response.content) / exported / 1e6:5.1f} | "
+              f"{streamed_peak:10.1f} MiB | {fetchall_peak:10.1f} MiB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Cost of the live-update streams (changes.py): memory per idle connected
+client, CPU while idle, and the time from publish() in a worker thread (as
+in the sync mutation routes) until every client has the event.
+
+Clients are stream() generators consumed by tasks on one event loop, the
+same objects a real connection drives minus the socket. For scale, the
+bytes one change costs a client as an event are compared with the full
+page the client would otherwise reload.
+
+    python bench_events.py [--clients 10 100 1000] [--events 200] [--notes 50]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+async def measure(app, changes, clients, events):
+    feed = changes.ChangeFeed()
+    remaining = {}
+    published = {}
+    latencies = []
+    done = asyncio.Event()
+
+    async def client():
+        async for text in changes.stream(feed):
+            if text.startswith('event:'):
+                number = int(text.split('\nid: ', 1)[1].split('\n', 1)[0].rsplit('-', 1)[1])
+                remaining[number] -= 1
+                if not remaining[number]:
+                    latencies.append(time.perf_counter() - published[number])
+                    if number == events:
+                        done.set()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tasks = [asyncio.create_task(client()) for _ in range(clients)]
+    await asyncio.sleep(0.2)
+    per_client = (tracemalloc.get_traced_memory()[0] - before) / clients
+    tracemalloc.stop()
+
+    # Idle: nothing published, heartbeats only
+    cpu = time.process_time()
+    await asyncio.sleep(1)
+    idle_cpu = (time.process_time() - cpu) * 1000
+
+    card = app.to_xml(app.note_card(app.Note(id=1, content='Bench item: oat milk', created_at='2024-01-01',
+                                             status='active')))
+
+    def publisher():
+        for number in range(1, events + 1):
+            remaining[number] = clients
+            published[number] = time.perf_counter()
+            feed.publish('inserted', card)
+            # Wait for delivery so each latency is one event's fan-out
+            while len(latencies) < number:
+                time.sleep(0.0002)
+
+    thread = threading.Thread(target=publisher)
+    thread.start()
+    await asyncio.wait_for(done.wait(), 120)
+    thread.join()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    latencies.sort()
+    return per_client, idle_cpu, statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.95) - 1] * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the notes live-update streams.')
+    parser.add_argument('--clients', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--notes', type=int, default=50, help='active notes on the page a reload would fetch')
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(tempfile.mkdtemp(prefix='events-bench-'))
+    sys.path.insert(0, here)
+    import main as app
+    import changes
+    from starlette.testclient import TestClient
+
+    for i in range(args.notes):
+        app.notes.insert(content=f'Active item {i}: bananas', created_at='2024-01-01', status='active')
+    page = len(TestClient(app.app).get('/').content)
+    event = len(changes.message('inserted', app.to_xml(app.note_card(app.notes.get(1))), 'x-1'))
+    print(f"bytes per change: {event} as an event, {page} reloading the page with {args.notes} active notes")
+
+    print(f"{args.events} events each; fan-out is publish() in a thread until every client has it")
+    print(f"{'clients':>7} | {'memory/client':>13} | {'idle CPU ms/s':>13} | {'fan-out ms p50 / p95':>20}")
+    for clients in args.clients:
+        per_client, idle_cpu, p50, p95 = asyncio.run(measure(app, changes, clients, args.events))
+        print(f"{clients:7} | {per_client / 1024:10.1f} KiB | {idle_cpu:13.2f} | {p50:9.2f} / {p95:8.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Search latency over synthetic data: FTS5 (search_notes / search_items and
+the rendered HTMX fragment) against a LIKE '%word%' scan of the table.
+
+Imports the notes or menu app against a throwaway database in a temp
+directory and bulk-inserts --rows rows of random words, Zipf-distributed
+so the queries cover rare, middling and very common terms.
+
+    python bench_search.py [--app notes|menu] [--rows 100000] [--runs 50]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+def vocabulary(rng, size):
+    """`size` distinct pronounceable words."""
+    consonants, vowels = 'bcdfghklmnprstvz', 'aeiou'
+    words = {}
+    while len(words) < size:
+        words[''.join(rng.choice(consonants) + rng.choice(vowels) for _ in range(rng.randint(2, 4)))] = None
+    return list(words)
+
+def timed(fn, runs):
+    """(median ms, p95 ms) of `runs` calls to fn."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.95) - 1]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark full-text search in the notes or menu app.')
+    parser.add_argument('--app', choices=('notes', 'menu'), default='notes')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--vocabulary', type=int, default=20_000)
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    app_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), args.app)
+    os.chdir(tempfile.mkdtemp(prefix='search-bench-'))
+    sys.path.insert(0, app_dir)
+    import main as app
+    from fasthtml.common import to_xml
+    from common.search import match_query
+    table = 'notes' if args.app == 'notes' else 'menu_items'
+    search = app.search_notes if args.app == 'notes' else app.search_items
+
+    rng = random.Random(0)
+    words = vocabulary(rng, args.vocabulary)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+    columns = 'content, created_at' + (', status' if table == 'notes' else '')
+    extra = ('active',) if table == 'notes' else ()
+    start = time.perf_counter()
+    with app.db.conn:
+        for offset in range(0, args.rows, 10_000):
+            batch = [(' '.join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(4, 12))), '2024-01-01') + extra
+                     for _ in range(min(10_000, args.rows - offset))]
+            app.db.conn.executemany(f"INSERT INTO {table} ({columns}) VALUES ({', '.join('?' * len(batch[0]))})", batch)
+    print(f"{args.app}: {args.rows} rows inserted and indexed in {time.perf_counter() - start:.1f} s")
+
+    queries = [
+        ('rare word', words[-1]),
+        ('middling word', words[len(words) // 20]),
+        ('common word', words[0]),
+        ('prefix', words[5][:3]),
+        ('one letter', words[3][0]),
+        ('two words', f'{words[1]} {words[2]}'),
+    ]
+    print(f"{args.runs} runs each; times in ms as median / p95")
+    print(f"{'query':14} | {'matches':>7} | {'FTS query':>13} | {'fragment':>13} | {'LIKE scan':>13}")
+    for label, q in queries:
+        matches = len(app.db.execute(
+            f"SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ?", [match_query(q)]).fetchall())
+        fts = timed(lambda: search(q), args.runs)
+        fragment = timed(lambda: to_xml(app.search_results(q)), args.runs)
+        like_args = [f'%{word}%' for word in q.split()]
+        like_sql = (f"SELECT id, content FROM {table} WHERE " + ' AND '.join(['content LIKE ?'] * len(like_args))
+                    + " ORDER BY id DESC LIMIT 20")
+        like = timed(lambda: app.db.execute(like_sql, like_args).fetchall(), max(args.runs // 5, 3))
+        print(f"{label:14} | {matches:7} | {fts[0]:5.2f} / {fts[1]:5.2f} | {fragment[0]:5.2f} / {fragment[1]:5.2f} | "
+              f"{like[0]:5.2f} / {like[1]:5.2f}")
+
+if __name__ == '__main__':
+    main()
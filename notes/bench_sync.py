@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+A burst of shopping-list taps sent one request each (the HTMX posts)
+against queued and sent as one /sync batch (common/offline.py).
+
+Runs the app in-process with Starlette's TestClient against a throwaway
+database in a temp directory. Server time and bytes are measured; the
+time a phone waits adds --rtt per request on top, which is where the
+batch wins on a poor connection.
+
+    python bench_sync.py [--taps 1 10 50 200] [--rtt 300] [--rounds 5]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+def taps(count, first_id):
+    """A mix of adds, archives, reactivations and deletes as (action, note id or None)."""
+    pattern = ('add', 'archive', 'activate', 'archive', 'delete')
+    return [(action, None if action == 'add' else first_id + i) for i, action in
+            ((i, pattern[i % len(pattern)]) for i in range(count))]
+
+def one_by_one(client, actions):
+    """(requests, bytes, seconds) posting each action as the HTMX forms do."""
+    size, start = 0, time.perf_counter()
+    for action, note_id in actions:
+        if action == 'add':
+            response = client.post('/add', data={'content': 'Bench item: tea'}, headers={'HX-Request': 'true'})
+        else:
+            response = client.post(f'/{action}/{note_id}', headers={'HX-Request': 'true'})
+        size += len(response.request.content) + len(response.content)
+    return len(actions), size, time.perf_counter() - start
+
+def batched(client, actions, ops_for):
+    """(requests, bytes, seconds) sending the actions as one /sync batch."""
+    start = time.perf_counter()
+    response = client.post('/sync', json={'ops': [ops_for(action, note_id, i) for i, (action, note_id)
+                                                   in enumerate(actions)]})
+    assert all(result['status'] in ('applied', 'missing') for result in response.json()['results'])
+    return 1, len(response.request.content) + len(response.content), time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark batched sync against one request per tap.')
+    parser.add_argument('--taps', type=int, nargs='+', default=[1, 10, 50, 200])
+    parser.add_argument('--rtt', type=float, default=300, help='round trip of the phone connection (ms)')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(tempfile.mkdtemp(prefix='sync-bench-'))
+    sys.path.insert(0, here)
+    import main as notes_app
+    from starlette.testclient import TestClient
+    from common.offline import utc_now
+    client = TestClient(notes_app.app)
+    values = {'archive': {'status': 'archived'}, 'activate': {'status': 'active'}}
+
+    def ops_for(action, note_id, index):
+        if action == 'add':
+            return {'op': 'add', 'key': f'bench-{time.perf_counter_ns()}-{index}',
+                    'values': {'content': 'Bench item: tea'}, 'at': utc_now()}
+        if action == 'delete':
+            return {'op': 'delete', 'id': note_id, 'at': utc_now()}
+        return {'op': 'set', 'id': note_id, 'values': values[action], 'at': utc_now()}
+
+    print(f"server time per burst (median of {args.rounds}), and the wait at {args.rtt:g} ms round trip")
+    print(f"{'taps':>5} | {'per tap: reqs':>13} | {'bytes':>7} | {'server ms':>9} | {'wait ms':>8} | "
+          f"{'batch: bytes':>12} | {'server ms':>9} | {'wait ms':>7}")
+    for count in args.taps:
+        results = {}
+        for name in ('single', 'batch'):
+            runs = []
+            for _ in range(args.rounds):
+                # Fresh active notes for the archives, reactivations and deletes to act on
+                first = notes_app.notes.insert(content='Bench item: coffee', created_at='2024-01-01',
+                                               status='active').id
+                for _ in range(count - 1):
+                    notes_app.notes.insert(content='Bench item: coffee', created_at='2024-01-01', status='active')
+                actions = taps(count, first)
+                runs.append(one_by_one(client, actions) if name == 'single' else batched(client, actions, ops_for))
+            requests, size = runs[0][0], runs[0][1]
+            server = statistics.median(run[2] for run in runs) * 1000
+            results[name] = requests, size, server, server + requests * args.rtt
+        single, batch = results['single'], results['batch']
+        print(f"{count:5} | {single[0]:13} | {single[1]:7} | {single[2]:9.1f} | {single[3]:8.0f} | "
+              f"{batch[1]:12} | {batch[2]:9.1f} | {batch[3]:7.0f}")
+
+if __name__ == '__main__':
+    main()
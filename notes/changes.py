@@ -0,0 +1,126 @@
+import asyncio
+import collections
+import os
+import threading
+import time
+
+# Events queued per connected client; a client that falls this far behind
+# is disconnected, and its browser reconnects and catches up from HISTORY
+SUBSCRIBER_QUEUE_SIZE = 32
+# Recent events kept for clients reconnecting with Last-Event-ID (a phone
+# waking up, a dropped connection); older gaps get a 'resync' event instead
+HISTORY = int(os.environ.get('NOTES_EVENT_HISTORY', 256))
+# A comment line this often keeps proxies from closing idle streams and
+# notices clients that went away without closing the connection
+HEARTBEAT_SECONDS = float(os.environ.get('NOTES_HEARTBEAT_SECONDS', 25))
+# How long browsers wait before reconnecting a dropped stream
+RETRY_MS = 3000
+
+class ChangeFeed:
+    """
+    In-process pub/sub of list changes for the open event streams.
+    publish() may be called from any thread (sync routes run in a
+    threadpool); delivery happens on the event loop the streams run on.
+    Event ids are '<boot>-<sequence>', so ids from before a restart are
+    recognised as unknown.
+    """
+
+    def __init__(self):
+        self.boot = f'{int(time.time()):x}'
+        self.last = 0
+        self.history = collections.deque(maxlen=HISTORY)
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.loop = None
+
+    def publish(self, event, data):
+        """Record an event and hand it to every connected stream."""
+        with self.lock:
+            self.last += 1
+            item = (self.last, message(event, data, f'{self.boot}-{self.last}'))
+            self.history.append(item)
+            # Scheduled under the lock so deliveries keep the sequence order
+            if self.loop is not None and self.subscribers:
+                self.loop.call_soon_threadsafe(self._broadcast, item)
+
+    def subscribe(self, last_event_id=None):
+        """
+        A bounded queue of (sequence, message) for a new stream, preloaded
+        with the events after last_event_id, or with a 'resync' event if
+        those are no longer all in the history.
+        """
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self.lock:
+            self.loop = asyncio.get_running_loop()
+            if last_event_id:
+                missed = self._since(last_event_id)
+                if missed is None or len(missed) > SUBSCRIBER_QUEUE_SIZE:
+                    queue.put_nowait((self.last, message('resync', '', f'{self.boot}-{self.last}')))
+                else:
+                    for item in missed:
+                        queue.put_nowait(item)
+            self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        with self.lock:
+            self.subscribers.discard(queue)
+
+    def _since(self, last_event_id):
+        """History after last_event_id, or None if it is not from this run or too old."""
+        boot, _, number = last_event_id.partition('-')
+        if boot != self.boot or not number.isdigit():
+            return None
+        number = int(number)
+        oldest = self.history[0][0] if self.history else self.last + 1
+        if not oldest - 1 <= number <= self.last:
+            return None
+        return [item for item in self.history if item[0] > number]
+
+    def _broadcast(self, item):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(item)
+            except asyncio.QueueFull:
+                # Slow client: end its stream rather than buffer without bound
+                self.unsubscribe(queue)
+                self._end(queue)
+
+    @staticmethod
+    def _end(queue):
+        """Push the end-of-stream marker, discarding queued events if needed."""
+        while True:
+            try:
+                queue.put_nowait(None)
+                return
+            except asyncio.QueueFull:
+                queue.get_nowait()
+
+def message(event, data, event_id=None):
+    """One text/event-stream message; multi-line data becomes several data: lines."""
+    lines = [f'event: {event}'] + ([f'id: {event_id}'] if event_id else [])
+    lines += [f'data: {line}' for line in str(data).splitlines() or ['']]
+    return '\n'.join(lines) + '\n\n'
+
+async def stream(feed, last_event_id=None):
+    """The event stream for one client, with heartbeats while nothing happens."""
+    queue = feed.subscribe(last_event_id)
+    sent = -1
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            if item is None:
+                break
+            number, text = item
+            # An event published while this stream was subscribing can be
+            # both replayed and delivered
+            if number > sent:
+                sent = number
+                yield text
+    finally:
+        feed.unsubscribe(queue)
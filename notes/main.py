@@ -1,27 +1,183 @@
+import sys
+from pathlib import Path
 from fasthtml.common import *
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.bulk import BadImport, add_import_route, bulk_section, export_response, import_request, is_form
+from common.db import create_table, open_db
+from common.offline import (apply_batch, batch_response, client_script, current_rows, service_worker,
+                            sync_migration, utc_now)
+from common.search import SEARCH_LIMIT, fts_migration, marked, search, search_form
+from changes import ChangeFeed, stream
+
+def add_status(db):
+    # Databases from before the status column; backfill legacy rows so
+    # listings filter on status alone
+    if 'status' not in db.t.notes.columns_dict:
+        db.execute("ALTER TABLE notes ADD COLUMN status TEXT DEFAULT 'active'")
+    db.execute("UPDATE notes SET status = 'active' WHERE status IS NULL")
+
+MIGRATIONS = [
+    create_table('notes', id=int, content=str, created_at=str, status=str, pk='id'),
+    add_status,
+    # The (status, id) keyset the listings page through
+    "CREATE INDEX IF NOT EXISTS idx_notes_status_id ON notes (status, id)",
+    fts_migration('notes'),
+    sync_migration('notes'),
+]
+
 # Initialize the database
-db = database('notes.db')
+db = open_db('notes.db', MIGRATIONS)
 notes = db.t.notes
-if notes not in db.t:
-    notes.create(id=int, content=str, created_at=str, status=str, pk='id')
 Note = notes.dataclass()
 
-# Add status column if it doesn't exist (migration)
-try:
-    db.execute("ALTER TABLE notes ADD COLUMN status TEXT DEFAULT 'active'")
-except:
-    pass
+# Notes per page; further pages load as the end of a list scrolls into view
+PAGE_SIZE = 50
+# Columns that syncs and imports may set, with their allowed values (None: any text)
+FIELDS = {'content': None, 'status': ('active', 'archived')}
+EXPORT_COLUMNS = ['id', 'content', 'created_at', 'status', 'updated_at']
 
 # Create the FastHTML app
 app, rt = fast_app()
 
+# Changes pushed to every open page over /events (see changes.py)
+changes = ChangeFeed()
+
+# Open pages patch their lists from the event stream: cards arrive
+# rendered, deletions as the note id, and 'resync' (after a gap too long
+# to replay) reloads both lists
+LIVE_SCRIPT = """
+(() => {
+  const source = new EventSource('/notes/events');
+  const place = list => event => {
+    const card = document.createRange().createContextualFragment(event.data).firstElementChild;
+    document.getElementById(card.id)?.remove();
+    document.querySelector(list).prepend(card);
+    htmx.process(card);
+  };
+  source.addEventListener('inserted', place('#active-notes'));
+  source.addEventListener('reactivated', place('#active-notes'));
+  source.addEventListener('archived', place('#archived-notes'));
+  source.addEventListener('deleted', event => document.getElementById('note-' + event.data)?.remove());
+  source.addEventListener('resync', () => {
+    for (const status of ['active', 'archived'])
+      htmx.ajax('GET', `/notes/page/${status}`, {target: `#${status}-notes`, swap: 'innerHTML'});
+  });
+  // A card can already be shown when a swap brings it again: actions publish
+  // their event before answering, and moved cards can arrive before a list's
+  // first page. Every swap, main or out of band, first removes the copies
+  // already shown of the cards it brings, except the element it replaces.
+  let replacing = null;
+  const dedupe = (cards, keep) => {
+    for (const card of cards)
+      for (const shown of document.querySelectorAll('#' + CSS.escape(card.id)))
+        if (shown !== keep) shown.remove();
+  };
+  document.addEventListener('htmx:beforeSwap', event => {
+    replacing = event.detail.target;
+    const response = document.createRange().createContextualFragment(event.detail.serverResponse);
+    dedupe(response.querySelectorAll('.note-card'), replacing);
+  });
+  document.addEventListener('htmx:oobBeforeSwap', event =>
+    dedupe(event.detail.fragment.querySelectorAll('.note-card'), replacing));
+})();
+"""
+
+def note_button(label, action, note_id, color, margin=''):
+    """One-button form: a plain POST without JS, an HTMX swap of its card with it"""
+    return Form(
+        Button(label, type='submit',
+               style=f'padding: 4px 12px; background-color: {color}; color: white; border: none; cursor: pointer;'),
+        method='post',
+        action=f'/notes/{action}/{note_id}',
+        hx_post=f'/notes/{action}/{note_id}',
+        style=f'display: inline;{margin}'
+    )
+
+def note_card(note):
+    """A single note card, styled and with actions according to its status"""
+    archived = note.status == 'archived'
+    return Div(
+        P(Strong(f"Item #{note.id}"), style='margin: 0; color: #666; font-size: 0.9em;'),
+        P(note.content, cls='content', style='margin: 10px 0;'),
+        Div(
+            note_button('Reactivate', 'activate', note.id, '#28a745') if archived
+            else note_button('Archive', 'archive', note.id, '#6c757d'),
+            note_button('Delete', 'delete', note.id, '#dc3545', ' margin-left: 8px;'),
+            style='display: flex; gap: 8px;'
+        ),
+        id=f'note-{note.id}',
+        cls='note-card',
+        # Inherited by the action buttons: their response replaces this card
+        hx_target='this',
+        hx_swap='outerHTML',
+        style='border: 1px solid #ddd; padding: 15px; margin-bottom: 15px; border-radius: 5px; '
+              + ('background-color: #e9ecef; opacity: 0.8;' if archived else 'background-color: #f9f9f9;')
+    )
+
+def notes_page(status, before=None):
+    """Up to PAGE_SIZE notes with `status` and id below `before`, newest first,
+    plus the id to continue from (None on the last page)"""
+    where, args = 'status = ?', [status]
+    if before is not None:
+        where += ' AND id < ?'
+        args.append(before)
+    rows = notes(where=where, where_args=args, order_by='id DESC', limit=PAGE_SIZE + 1)
+    return rows[:PAGE_SIZE], (rows[PAGE_SIZE - 1].id if len(rows) > PAGE_SIZE else None)
+
+def note_list(status, before=None):
+    """One page of cards followed by a loader for the next page, if any"""
+    rows, next_before = notes_page(status, before)
+    return (*[note_card(note) for note in rows], load_more(status, next_before) if next_before else None)
+
+def load_more(status, before):
+    """Link to the next page; with HTMX it replaces itself with that page once scrolled into view"""
+    url = f'/notes/page/{status}' + (f'?before={before}' if before else '')
+    return A(f'Load more {status} items', href=url,
+             hx_get=url, hx_trigger='revealed, click', hx_target='this', hx_swap='outerHTML',
+             cls='load-more', style='display: block; padding: 10px; text-align: center; color: #666;')
+
+def search_notes(q, limit=SEARCH_LIMIT):
+    """Best-ranked notes matching `q` as (id, status, highlighted content) rows (see common/search.py)"""
+    return search(db, 'notes', q, ['status'], limit=limit)
+
+def search_results(q):
+    """Ranked matches for `q` with the matching words highlighted"""
+    if not q.strip():
+        return ''
+    rows = search_notes(q)
+    if not rows:
+        return P('No matching notes.', style='color: #666;')
+    return Div(
+        *[Div(
+            P(Strong(f"Item #{row_id}"), f' ({status})' if status == 'archived' else '',
+              style='margin: 0; color: #666; font-size: 0.9em;'),
+            P(*marked(text), style='margin: 6px 0 0;'),
+            style='border-left: 3px solid #007bff; padding: 6px 12px; margin-bottom: 10px;'
+        ) for row_id, status, text in rows],
+        style='margin-bottom: 20px;'
+    )
+
+def moved_card(note, target):
+    """Response for a status change: the empty main swap removes the old card,
+    and the re-rendered card is added to the top of the other list out of band
+    (an OOB swap other than outerHTML inserts the wrapper's children)"""
+    return Div(note_card(note), hx_swap_oob=f'afterbegin:{target}')
+
+# Actions the page queues while offline and sends to /sync in batches
+OFFLINE_SCRIPT = client_script('/notes', 'note-', '#active-notes', {
+    'add': {'op': 'add'},
+    'archive': {'op': 'set', 'values': {'status': 'archived'}, 'move': '#archived-notes'},
+    'activate': {'op': 'set', 'values': {'status': 'active'}, 'move': '#active-notes'},
+    'delete': {'op': 'delete'},
+})
+
+def publish(event, note):
+    """Send the open pages the re-rendered card of a changed note"""
+    changes.publish(event, to_xml(note_card(note)))
+
 @rt('/')
 def get():
-    # Get all notes, separated by status
-    active_notes = notes(where='status = "active" OR status IS NULL', order_by='id DESC')
-    archived_notes = notes(where='status = "archived"', order_by='id DESC')
-
     # Create the form for new notes
     form = Form(
         Textarea(name='content', placeholder='Enter your note...', rows=4,
@@ -30,6 +186,10 @@ def get():
                style='padding: 8px 16px; background-color: #007bff; color: white; border: none; cursor: pointer;'),
         method='post',
         action='/notes/add',
+        hx_post='/notes/add',
+        hx_target='#active-notes',
+        hx_swap='afterbegin',
+        hx_on__after_request='if (event.detail.successful) this.reset()',
         style='width: 100%;'
     )
 
@@ -39,89 +199,154 @@ def get():
         style='display: flex; gap: 20px; margin-bottom: 20px; align-items: flex-start;'
     )
 
-    # Display active notes
+    # Search box, with results shown above the lists
+    search_section = Div(search_form('/notes', 'Search notes...'), Div(id='search-results'))
+
+    # Display active and archived notes; the lists stay in the page even when
+    # empty so HTMX responses can add cards to them. Archived notes are not
+    # rendered up front, only a loader that fetches their first page.
     active_list = Div(
         H3('Active Items', style='margin-bottom: 15px;'),
-        *[Div(
-            P(Strong(f"Item #{note.id}"), style='margin: 0; color: #666; font-size: 0.9em;'),
-            P(note.content, style='margin: 10px 0;'),
-            Div(
-                Form(
-                    Button('Archive', type='submit',
-                           style='padding: 4px 12px; background-color: #6c757d; color: white; border: none; cursor: pointer;'),
-                    method='post',
-                    action=f'/notes/archive/{note.id}',
-                    style='display: inline;'
-                ),
-                Form(
-                    Button('Delete', type='submit',
-                           style='padding: 4px 12px; background-color: #dc3545; color: white; border: none; cursor: pointer;'),
-                    method='post',
-                    action=f'/notes/delete/{note.id}',
-                    style='display: inline; margin-left: 8px;'
-                ),
-                style='display: flex; gap: 8px;'
-            ),
-            style='border: 1px solid #ddd; padding: 15px; margin-bottom: 15px; border-radius: 5px; background-color: #f9f9f9;'
-        ) for note in active_notes],
+        Div(*note_list('active'), id='active-notes'),
         style='margin-top: 20px;'
     )
 
-    # Display archived notes
+    has_archived = notes(where="status = 'archived'", limit=1)
     archived_list = Div(
         H3('Archived Items', style='margin-bottom: 15px; margin-top: 30px;'),
-        *[Div(
-            P(Strong(f"Item #{note.id}"), style='margin: 0; color: #666; font-size: 0.9em;'),
-            P(note.content, style='margin: 10px 0;'),
-            Div(
-                Form(
-                    Button('Reactivate', type='submit',
-                           style='padding: 4px 12px; background-color: #28a745; color: white; border: none; cursor: pointer;'),
-                    method='post',
-                    action=f'/notes/activate/{note.id}',
-                    style='display: inline;'
-                ),
-                Form(
-                    Button('Delete', type='submit',
-                           style='padding: 4px 12px; background-color: #dc3545; color: white; border: none; cursor: pointer;'),
-                    method='post',
-                    action=f'/notes/delete/{note.id}',
-                    style='display: inline; margin-left: 8px;'
-                ),
-                style='display: flex; gap: 8px;'
-            ),
-            style='border: 1px solid #ddd; padding: 15px; margin-bottom: 15px; border-radius: 5px; background-color: #e9ecef; opacity: 0.8;'
-        ) for note in archived_notes],
+        Div(load_more('archived', None) if has_archived else None, id='archived-notes'),
+        id='archived-section',
         style='margin-top: 20px;'
-    ) if len(archived_notes) > 0 else Div()
+    )
 
     return Titled('Lal-Zhao Family Shopping List',
+        # Hide the archived heading while there is nothing archived
+        Style('#archived-section:not(:has(.note-card, .load-more)) { display: none; }'),
         top_section,
+        bulk_section('/notes'),
+        search_section,
         active_list,
         archived_list,
+        Script(LIVE_SCRIPT),
+        Script(OFFLINE_SCRIPT),
         style='max-width: 1000px; margin: 0 auto; padding: 20px; font-family: Arial, sans-serif;'
     )
 
+@rt('/page/{status}')
+def get(status: str, before: int = None):
+    """A further page of notes; a bare fragment for HTMX, a plain page otherwise"""
+    if status not in ('active', 'archived'):
+        return Response('Unknown status', status_code=404)
+    return note_list(status, before)
+
+@rt('/search')
+def get(htmx: HtmxHeaders, q: str = ''):
+    """Search results: the fragment for HTMX, a page with the search box otherwise"""
+    if htmx.request:
+        return search_results(q)
+    return Titled('Search notes',
+        search_form('/notes', 'Search notes...', q),
+        Div(search_results(q), id='search-results'),
+        A('Back to the list', href='/notes'),
+        style='max-width: 1000px; margin: 0 auto; padding: 20px; font-family: Arial, sans-serif;'
+    )
+
+@rt('/events')
+async def get(req):
+    """Server-sent list changes; browsers resume with Last-Event-ID after a drop"""
+    return StreamingResponse(stream(changes, req.headers.get('last-event-id')), media_type='text/event-stream',
+                             headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+async def import_items(req):
+    """Add many items at once: a list pasted on the page, or a text, CSV or JSON body (see common/bulk.py)"""
+    try:
+        count = await import_request(req, db, 'notes', FIELDS, defaults={'status': 'active'})
+    except BadImport as e:
+        return Response(str(e), status_code=400)
+    if count:
+        # Open pages reload their lists rather than receive every row
+        changes.publish('resync', '')
+    if is_form(req):
+        return RedirectResponse('/notes', status_code=303)
+    return JSONResponse({'imported': count})
+
+add_import_route(app, '/import', import_items)
+
+@rt('/export')
+def get(format: str = 'csv'):
+    """The whole table as a streamed CSV or JSON download"""
+    if format not in ('csv', 'json'):
+        return Response('Unknown format', status_code=404)
+    return export_response(db, 'notes', EXPORT_COLUMNS, format, 'notes')
+
+@rt('/service-worker')
+def get():
+    return service_worker('/notes')
+
+@rt('/sync', methods=['post'])
+def post(ops: list[dict] = None):
+    """Apply a batch of operations queued by the page, in one transaction"""
+    ops = ops or []
+    results = apply_batch(db, 'notes', ops, FIELDS, defaults={'status': 'active'})
+    rows = current_rows(notes, results)
+    for op, result in zip(ops, results):
+        if result['status'] != 'applied':
+            continue
+        note = rows.get(result['id'])
+        if note is None:
+            changes.publish('deleted', result['id'])
+        else:
+            publish('inserted' if op['op'] == 'add' else 'archived' if note.status == 'archived' else 'reactivated',
+                    note)
+    return batch_response(results, rows, note_card)
+
+# Mutations answer HTMX requests with just the affected fragment, and
+# plain form posts (no JS) with a redirect back to the page
 @rt('/add', methods=['post'])
-def post(content: str):
+def post(content: str, htmx: HtmxHeaders):
     from datetime import datetime
+    note = None
     if content.strip():
-        notes.insert(content=content, created_at=datetime.now().isoformat(), status='active')
+        note = notes.insert(content=content, created_at=datetime.now().isoformat(), status='active',
+                            updated_at=utc_now())
+        publish('inserted', note)
+    if htmx.request:
+        return note_card(note) if note else ''
     return RedirectResponse('/notes', status_code=303)
 
-@rt('/archive/{note_id}', methods=['post'])
-def archive(note_id: int):
-    notes.update(id=note_id, status='archived')
+def set_status(note_id, status, event, target, htmx):
+    """Move a note to the other list; one another device already deleted
+    answers with the empty swap, which removes its stale card"""
+    try:
+        note = notes.update(id=note_id, status=status, updated_at=utc_now())
+    except NotFoundError:
+        note = None
+    else:
+        publish(event, note)
+    if htmx.request:
+        return moved_card(note, target) if note else ''
     return RedirectResponse('/notes', status_code=303)
 
+@rt('/archive/{note_id}', methods=['post'])
+def archive(note_id: int, htmx: HtmxHeaders):
+    return set_status(note_id, 'archived', 'archived', '#archived-notes', htmx)
+
 @rt('/activate/{note_id}', methods=['post'])
-def activate(note_id: int):
-    notes.update(id=note_id, status='active')
-    return RedirectResponse('/notes', status_code=303)
+def activate(note_id: int, htmx: HtmxHeaders):
+    return set_status(note_id, 'active', 'reactivated', '#active-notes', htmx)
 
 @rt('/delete/{note_id}', methods=['post'])
-def delete(note_id: int):
-    notes.delete(note_id)
+def delete(note_id: int, htmx: HtmxHeaders):
+    try:
+        notes.delete(note_id)
+    except NotFoundError:
+        # Deleted already, by another device
+        pass
+    else:
+        changes.publish('deleted', note_id)
+    if htmx.request:
+        return ''
     return RedirectResponse('/notes', status_code=303)
 
-serve(host='0.0.0.0', port=8765)
+# Open event streams would otherwise hold up a restart indefinitely
+serve(host='0.0.0.0', port=8765, timeout_graceful_shutdown=5)
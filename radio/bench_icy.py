@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Throughput of ICY metadata stripping (icy.IcyDemuxer) on a synthetic stream,
+compared with plain pass-through, at several upstream chunk sizes.
+
+    python bench_icy.py [--mb 256] [--metaint 16000]
+"""
+
+import argparse
+import time
+from icy import IcyDemuxer
+
+def synthetic_stream(total_bytes, metaint):
+    """Audio runs of `metaint` bytes, each followed by a metadata block."""
+    blocks = []
+    size = 0
+    i = 0
+    while size < total_bytes:
+        meta = b"StreamTitle='Artist %d - Track %d';StreamUrl='';" % (i // 10, i // 10)
+        meta += b'\0' * (-len(meta) % 16)
+        block = b'\xff' * metaint + bytes([len(meta) // 16]) + meta
+        blocks.append(block)
+        size += len(block)
+        i += 1
+    return b''.join(blocks)
+
+def chunked(data, chunk_size):
+    return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+def run(chunks, feed):
+    start = time.perf_counter()
+    out = 0
+    for chunk in chunks:
+        out += len(feed(chunk))
+    return time.perf_counter() - start, out
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ICY metadata stripping.')
+    parser.add_argument('--mb', type=int, default=256, help='stream size in MiB')
+    parser.add_argument('--metaint', type=int, default=16000)
+    args = parser.parse_args()
+
+    data = synthetic_stream(args.mb * 1024 * 1024, args.metaint)
+    mbit = len(data) * 8 / 1e6
+    print(f"{len(data) / 2**20:.0f} MiB synthetic stream, metaint {args.metaint}")
+    print(f"{'chunk':>8} | {'pass-through':>14} | {'icy demux':>14} | audio out")
+
+    for chunk_size in (1024, 4096, 8192, 65536):
+        chunks = chunked(data, chunk_size)
+        base, _ = run(chunks, lambda c: c)
+        titles = []
+        demux = IcyDemuxer(args.metaint, on_title=titles.append)
+        elapsed, out = run(chunks, demux.feed)
+        print(f"{chunk_size:>8} | {mbit / base:>9.0f} Mb/s | {mbit / elapsed:>9.0f} Mb/s | "
+              f"{out / 2**20:.1f} MiB, {len(titles)} titles")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark station-switch time-to-first-byte for the radio proxy: a fresh
+httpx.AsyncClient per request (old /proxy behaviour) vs. the shared pooled
+client from http_pool. A switch is a .pls fetch followed by opening the
+stream, like most presets in stations.txt.
+
+    python bench_proxy.py                      # local stand-in stream server
+    python bench_proxy.py --url https://somafm.com/groovesalad256.pls
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+import http_pool
+from playlist_parser import is_playlist, pick_stream_url
+
+async def stream_server(port):
+    """Minimal icecast stand-in: /p.pls points at an endless /stream."""
+    playlist = b'[playlist]\nFile1=http://127.0.0.1:%d/stream\n' % port
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                request = await reader.readuntil(b'\r\n\r\n')
+                if not request.startswith(b'GET /p.pls'):
+                    break
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: audio/x-scpls\r\n'
+                             b'Content-Length: %d\r\n\r\n%s' % (len(playlist), playlist))
+                await writer.drain()
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: audio/mpeg\r\n'
+                         b'Transfer-Encoding: chunked\r\n\r\n')
+            chunk = b'\xff' * 4096
+            frame = b'%x\r\n%s\r\n' % (len(chunk), chunk)
+            while True:
+                writer.write(frame)
+                await writer.drain()
+                await asyncio.sleep(0.01)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, '127.0.0.1', port)
+
+async def ttfb(client, url):
+    start = time.perf_counter()
+    if is_playlist(url):
+        response = await client.get(url, timeout=10.0)
+        url = pick_stream_url(url, response.text) or url
+    async with client.stream('GET', url) as response:
+        async for _ in response.aiter_bytes():
+            return time.perf_counter() - start
+
+async def fresh_client(url):
+    async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
+        return await ttfb(client, url)
+
+async def pooled_client(url):
+    return await ttfb(http_pool.get_client(), url)
+
+def report(name, samples):
+    ms = sorted(s * 1000 for s in samples)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    print(f"{name:16} | median {statistics.median(ms):7.2f} ms | p95 {p95:7.2f} ms | n={len(ms)}")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='stream URL to test (default: local stand-in server)')
+    parser.add_argument('-n', type=int, default=50, help='station switches per mode')
+    parser.add_argument('--port', type=int, default=8799)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = await stream_server(args.port)
+        url = f'http://127.0.0.1:{args.port}/p.pls'
+
+    print(f"Upstream: {url} (http2={http_pool.HTTP2})")
+    for name, fn in [('fresh client', fresh_client), ('pooled client', pooled_client)]:
+        await fn(url)  # warm-up (DNS, first connection)
+        samples = [await fn(url) for _ in range(args.n)]
+        report(name, samples)
+
+    await http_pool.stop()
+    if server:
+        server.close()
+
+if __name__ == '__main__':
+    asyncio.run(main())
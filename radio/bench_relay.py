@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+CPU cost of relaying audio at several chunk-coalescing policies.
+
+For each policy this starts a relay server process (relay.py behind a
+StreamingResponse, run by uvicorn) in front of a local upstream that writes
+small pieces at a fixed rate, attaches listeners for a while, then reads
+the relay process's CPU time from its rusage. Reports CPU ms per Mbit
+relayed to listeners, net of process startup.
+
+    python bench_relay.py [--listeners 20] [--seconds 10] [--rate 2]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+import httpx
+
+POLICIES = [
+    # (label, RADIO_COALESCE_BYTES, RADIO_COALESCE_MS)
+    ('per read', 0, 0),
+    ('8 KiB / 100 ms', 8 * 1024, 100),
+    ('32 KiB / 250 ms', 32 * 1024, 250),
+    ('128 KiB / 500 ms', 128 * 1024, 500),
+]
+
+def upstream_main(port, rate_mbit, piece):
+    """Endless audio/mpeg stream written in `piece`-byte writes at `rate_mbit`."""
+    async def handle(reader, writer):
+        try:
+            await reader.readuntil(b'\r\n\r\n')
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: audio/mpeg\r\n\r\n')
+            data = b'\xff' * piece
+            interval = piece * 8 / (rate_mbit * 1e6)
+            next_write = time.monotonic()
+            while True:
+                writer.write(data)
+                await writer.drain()
+                next_write += interval
+                await asyncio.sleep(max(0, next_write - time.monotonic()))
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+
+    async def serve():
+        server = await asyncio.start_server(handle, '127.0.0.1', port)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+def relay_main(port, upstream):
+    """Relay server: every GET / is one listener on the shared relay."""
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.responses import StreamingResponse
+    from starlette.routing import Route
+    from relay import open_listener
+
+    async def listen(request):
+        content_type, audio = await open_listener(upstream)
+        return StreamingResponse(audio, media_type=content_type)
+
+    app = Starlette(routes=[Route('/', listen)])
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning')
+
+def wait_for_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'port {port} did not open')
+
+async def listeners(url, count, seconds):
+    """Drain `count` concurrent listeners for `seconds`; return bytes received."""
+    received = [0] * count
+
+    async def one(i, client):
+        async with client.stream('GET', url) as response:
+            async for chunk in response.aiter_raw():
+                received[i] += len(chunk)
+
+    async with httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=count)) as client:
+        tasks = [asyncio.create_task(one(i, client)) for i in range(count)]
+        await asyncio.sleep(seconds)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return sum(received)
+
+def run_policy(args, coalesce_bytes, coalesce_ms, upstream, listener_count):
+    env = dict(os.environ, RADIO_COALESCE_BYTES=str(coalesce_bytes),
+               RADIO_COALESCE_MS=str(coalesce_ms), RADIO_BURST_BYTES='1')
+    relay = subprocess.Popen([sys.executable, __file__, 'relay', str(args.relay_port), upstream], env=env)
+    try:
+        wait_for_port(args.relay_port)
+        total = asyncio.run(listeners(f'http://127.0.0.1:{args.relay_port}/', listener_count, args.seconds))
+    finally:
+        relay.terminate()
+        _, _, usage = os.wait4(relay.pid, 0)
+    cpu = usage.ru_utime + usage.ru_stime
+    return cpu, total * 8 / 1e6
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'upstream':
+        return upstream_main(int(sys.argv[2]), float(sys.argv[3]), int(sys.argv[4]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'relay':
+        return relay_main(int(sys.argv[2]), sys.argv[3])
+
+    parser = argparse.ArgumentParser(description='Benchmark relay CPU per Mbit at several chunk policies.')
+    parser.add_argument('--listeners', type=int, default=20)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--rate', type=float, default=2.0, help='upstream rate in Mbit/s')
+    parser.add_argument('--piece', type=int, default=1400, help='upstream write size in bytes')
+    parser.add_argument('--upstream-port', type=int, default=8791)
+    parser.add_argument('--relay-port', type=int, default=8790)
+    args = parser.parse_args()
+
+    upstream = subprocess.Popen([sys.executable, __file__, 'upstream', str(args.upstream_port),
+                                 str(args.rate), str(args.piece)])
+    try:
+        wait_for_port(args.upstream_port)
+        url = f'http://127.0.0.1:{args.upstream_port}/stream'
+        print(f"{args.listeners} listeners x {args.seconds:g} s, upstream {args.rate:g} Mbit/s in {args.piece}-byte writes")
+        # CPU of a relay process that starts and idles, subtracted below
+        baseline, _ = run_policy(args, 0, 0, url, 0)
+        print(f"(process startup + idle baseline {baseline:.2f} s CPU, subtracted)")
+        print(f"{'policy':18} | {'relayed':>11} | {'CPU':>7} | CPU per Mbit")
+        for label, coalesce_bytes, coalesce_ms in POLICIES:
+            cpu, mbit = run_policy(args, coalesce_bytes, coalesce_ms, url, args.listeners)
+            cpu = max(cpu - baseline, 0)
+            print(f"{label:18} | {mbit:7.1f} Mbit | {cpu:5.2f} s | {cpu * 1000 / mbit:6.2f} ms")
+    finally:
+        upstream.terminate()
+        upstream.wait()
+
+if __name__ == '__main__':
+    main()
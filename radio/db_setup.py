@@ -1,48 +1,62 @@
 from fasthtml.common import *
 import json
+import sys
 from pathlib import Path
 from playlist_parser import parse_playlist_url
 
-def init_db():
-    db = database('radio.db')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.db import create_table, open_db
 
-    # Stations table
-    stations = db.t.stations
-    if stations not in db.t:
-        stations.create(
-            name=str,
-            url=str,
-            stream_url=str,
-            category=str,
-            description=str,
-            last_checked=str,
-            pk='name'
+# Columns written by the background health prober (prober.py)
+PROBE_COLUMNS = {
+    'reachable': int,
+    'latency_ms': int,
+    'content_type': str,
+    'bitrate': int,
+    'failures': int,
+    'next_check': str,
+}
+
+def load_stations(stations):
+    """Fill a new stations table from stations.txt"""
+    script_dir = Path(__file__).parent
+    with open(script_dir / 'stations.txt') as f:
+        station_data = json.load(f)
+
+    print("Loading stations...")
+    for name, url in station_data.items():
+        # Categorize by prefix
+        if name.startswith('SOMA'):
+            category = 'SomaFM'
+        elif name in ['BLUE', 'CRYO', 'VOWI']:
+            category = 'Bluemars'
+        else:
+            category = 'Other'
+
+        # Store original URL (let proxy handle resolution)
+        print(f"  {name}: {url}")
+
+        stations.insert(
+            name=name,
+            url=url,
+            stream_url=url,  # Store original, not resolved
+            category=category,
+            description=name,
+            last_checked=None
         )
-        # Load from stations.txt
-        script_dir = Path(__file__).parent
-        with open(script_dir / 'stations.txt') as f:
-            station_data = json.load(f)
-
-        print("Loading stations...")
-        for name, url in station_data.items():
-            # Categorize by prefix
-            if name.startswith('SOMA'):
-                category = 'SomaFM'
-            elif name in ['BLUE', 'CRYO', 'VOWI']:
-                category = 'Bluemars'
-            else:
-                category = 'Other'
-
-            # Store original URL (let proxy handle resolution)
-            print(f"  {name}: {url}")
-
-            stations.insert(
-                name=name,
-                url=url,
-                stream_url=url,  # Store original, not resolved
-                category=category,
-                description=name,
-                last_checked=None
-            )
-
-    return db
+
+def add_probe_columns(db):
+    # Add prober columns to databases created before they existed
+    stations = db.t.stations
+    for column, column_type in PROBE_COLUMNS.items():
+        if column not in stations.columns_dict:
+            stations.add_column(column, column_type)
+
+MIGRATIONS = [
+    create_table('stations', load_stations, name=str, url=str, stream_url=str, category=str, description=str,
+                 last_checked=str, **PROBE_COLUMNS, pk='name'),
+    add_probe_columns,
+]
+
+def init_db():
+    return open_db('radio.db', MIGRATIONS)
@@ -0,0 +1,41 @@
+import os
+import httpx
+
+# Pool limits, overridable from the environment (e.g. in radio.service)
+MAX_CONNECTIONS = int(os.environ.get('RADIO_MAX_CONNECTIONS', 100))
+MAX_KEEPALIVE = int(os.environ.get('RADIO_MAX_KEEPALIVE', 20))
+KEEPALIVE_EXPIRY = float(os.environ.get('RADIO_KEEPALIVE_EXPIRY', 60))
+
+# HTTP/2 needs the optional h2 package (pip install 'httpx[http2]')
+try:
+    import h2  # noqa: F401
+    HTTP2 = os.environ.get('RADIO_HTTP2', '1') != '0'
+except ImportError:
+    HTTP2 = False
+
+_client = None
+
+def get_client():
+    """Return the process-wide pooled client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            http2=HTTP2,
+            follow_redirects=True,
+        )
+    return _client
+
+async def start():
+    get_client()
+
+async def stop():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
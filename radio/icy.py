@@ -0,0 +1,72 @@
+import re
+
+_stream_title = re.compile(rb"StreamTitle='(.*?)';", re.S)
+
+def parse_stream_title(meta):
+    """Extract StreamTitle from an ICY metadata block, or None."""
+    match = _stream_title.search(meta)
+    if not match:
+        return None
+    raw = match.group(1)
+    try:
+        return raw.decode('utf-8').strip()
+    except UnicodeDecodeError:
+        return raw.decode('latin-1').strip()
+
+class IcyDemuxer:
+    """
+    Strip interleaved ICY metadata from a Shoutcast/Icecast stream.
+    The stream is `metaint` audio bytes, one length byte (x16), then that
+    many metadata bytes, repeated. `feed` returns the audio part of a chunk:
+    the chunk object itself when it holds no metadata (no copy), otherwise
+    one joined bytes object. `on_title` is called with each new StreamTitle.
+    """
+
+    def __init__(self, metaint, on_title=None):
+        self.metaint = metaint
+        self.on_title = on_title
+        self.audio_left = metaint
+        self.meta_left = None  # None: next byte is a length byte
+        self.meta = bytearray()
+        self.title = None
+
+    def feed(self, chunk):
+        n = len(chunk)
+        # Fast path: chunk lies entirely inside an audio run
+        if n <= self.audio_left:
+            self.audio_left -= n
+            return chunk
+
+        view = memoryview(chunk)
+        parts = []
+        pos = 0
+        while pos < n:
+            if self.audio_left:
+                end = min(pos + self.audio_left, n)
+                parts.append(view[pos:end])
+                self.audio_left -= end - pos
+                pos = end
+            elif self.meta_left is None:
+                self.meta_left = view[pos] * 16
+                pos += 1
+                if not self.meta_left:
+                    self.meta_left = None
+                    self.audio_left = self.metaint
+            else:
+                end = min(pos + self.meta_left, n)
+                self.meta += view[pos:end]
+                self.meta_left -= end - pos
+                pos = end
+                if not self.meta_left:
+                    self._publish()
+                    self.meta_left = None
+                    self.audio_left = self.metaint
+        return b''.join(parts)
+
+    def _publish(self):
+        title = parse_stream_title(self.meta)
+        self.meta.clear()
+        if title is not None and title != self.title:
+            self.title = title
+            if self.on_title:
+                self.on_title(title)
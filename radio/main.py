@@ -1,7 +1,15 @@
 from fasthtml.common import *
 from starlette.responses import RedirectResponse
 from db_setup import init_db
-from playlist_parser import parse_playlist_url
+from playlist_parser import resolve_playlist_url
+from relay import OTHER_LABEL, open_listener, now_playing
+import http_pool
+import prober
+import metrics
+from contextlib import asynccontextmanager
+from starlette.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response
+import asyncio
+import hashlib
 import json
 import urllib.parse
 import re
@@ -10,7 +18,30 @@ import re
 db = init_db()
 stations_table = db.t.stations
 
-app, rt = fast_app()
+@asynccontextmanager
+async def lifespan(app):
+    # One pooled upstream HTTP client and the station health prober live
+    # for the lifetime of the app
+    await http_pool.start()
+    prober.start(stations_table, on_change=bump_stations_version)
+    yield
+    await prober.stop()
+    await http_pool.stop()
+
+app, rt = fast_app(lifespan=lifespan)
+
+def is_dead(station):
+    """True if the health prober's last check failed (unknown counts as alive)."""
+    return station.get('reachable') == 0
+
+# The rendered index page is cached until the station list changes.
+# Routes that change what the page shows call bump_stations_version().
+stations_version = 0
+index_cache = {'version': None, 'html': None, 'etag': None}
+
+def bump_stations_version():
+    global stations_version
+    stations_version += 1
 
 def validate_station_input(name, url):
     """Validate and sanitize station name and URL."""
@@ -43,6 +74,9 @@ def validate_station_input(name, url):
 # Embedded JavaScript using native HTML5 Audio
 audio_js = """
 let currentStation = null;
+let currentStreamUrl = null;
+let nowPlayingTimer = null;
+let lastTrackTitle = null;
 let audio = null;
 const nowPlaying = document.getElementById('nowPlaying');
 const debugLog = document.getElementById('debugLog');
@@ -65,6 +99,8 @@ function log(message, isError = false) {
 
 function playStation(name, url) {
     currentStation = name;
+    currentStreamUrl = new URL(url, location.href).searchParams.get('url');
+    lastTrackTitle = null;
     log(`Attempting to play: ${name}`);
     log(`Stream URL: ${url}`);
 
@@ -91,6 +127,7 @@ function playStation(name, url) {
 
         // Update Media Session API for background playback support
         updateMediaSession(name);
+        pollNowPlaying();
     });
     audio.addEventListener('pause', () => {
         log('Paused');
@@ -155,12 +192,30 @@ function setVolume(value) {
     }
 }
 
-function updateMediaSession(stationName) {
+// Poll the proxy for the current track (ICY metadata) while playing
+function pollNowPlaying() {
+    clearTimeout(nowPlayingTimer);
+    if (!audio || audio.paused || !currentStreamUrl) return;
+    const station = currentStation;
+    fetch('/radio/now_playing?url=' + encodeURIComponent(currentStreamUrl))
+        .then(r => r.json())
+        .then(data => {
+            if (station !== currentStation || !data.title || data.title === lastTrackTitle) return;
+            lastTrackTitle = data.title;
+            log(`Track: ${data.title}`);
+            nowPlaying.textContent = 'Now Playing: ' + currentStation + ' — ' + data.title;
+            updateMediaSession(currentStation, data.title);
+        })
+        .catch(() => {})
+        .finally(() => { nowPlayingTimer = setTimeout(pollNowPlaying, 15000); });
+}
+
+function updateMediaSession(stationName, trackTitle) {
     // Media Session API for background playback and native controls
     if ('mediaSession' in navigator) {
         navigator.mediaSession.metadata = new MediaMetadata({
-            title: stationName,
-            artist: 'Lalten Radio',
+            title: trackTitle || stationName,
+            artist: trackTitle ? stationName : 'Lalten Radio',
             album: 'Web Radio Player',
             artwork: [
                 { src: 'https://lalten.org/favicon.ico', sizes: '48x48', type: 'image/x-icon' },
@@ -199,24 +254,41 @@ function updateMediaSession(stationName) {
 log('Radio player initialized (HTML5 Audio)');
 """
 
+# audio_js is served as a separate asset whose URL changes with its content,
+# so browsers can cache it forever. (No .js suffix: FastHTML's static file
+# route claims those paths.)
+audio_js_version = hashlib.sha256(audio_js.encode()).hexdigest()[:12]
+audio_js_path = f'/radio/assets/audio/{audio_js_version}'
+
+# Station names by URL (as listed and as resolved), rebuilt when the list changes
+station_names = {'version': None, 'names': {}}
+
+def station_label(url):
+    """The metrics label for a proxied URL: its station's name, or OTHER_LABEL."""
+    if station_names['version'] != stations_version:
+        names = {}
+        for station in stations_table():
+            names[station['url']] = names[station['stream_url']] = station['name']
+        station_names.update(version=stations_version, names=names)
+    return station_names['names'].get(url, OTHER_LABEL)
+
 @rt('/proxy')
 async def proxy_stream(url: str):
     """Proxy audio streams to handle HTTP sources and playlist files."""
     from starlette.responses import StreamingResponse
-    import httpx
 
     # Resolve playlist URLs to direct stream URLs
-    resolved_url = parse_playlist_url(url)
+    resolved_url = await resolve_playlist_url(url)
 
-    async def stream_audio():
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            async with client.stream('GET', resolved_url) as response:
-                async for chunk in response.aiter_bytes(chunk_size=8192):
-                    yield chunk
+    # Listeners of the same station share one upstream connection
+    try:
+        content_type, audio = await open_listener(resolved_url, station_label(url))
+    except asyncio.TimeoutError:
+        return Response('Upstream did not respond', status_code=504)
 
     return StreamingResponse(
-        stream_audio(),
-        media_type='audio/mpeg',
+        audio,
+        media_type=content_type,
         headers={
             'Cache-Control': 'no-cache',
             'Accept-Ranges': 'none',
@@ -226,6 +298,26 @@ async def proxy_stream(url: str):
         }
     )
 
+@rt('/assets/audio/{version}')
+def get(version: str):
+    if version != audio_js_version:
+        return Response(status_code=404)
+    return Response(audio_js, media_type='application/javascript', headers={
+        'Cache-Control': 'public, max-age=31536000, immutable',
+    })
+
+@rt('/now_playing')
+async def get(url: str):
+    """Current track title of a station being relayed (from ICY metadata)."""
+    resolved_url = await resolve_playlist_url(url)
+    return JSONResponse({'title': now_playing(resolved_url)},
+                        headers={'Cache-Control': 'no-cache'})
+
+@rt('/metrics')
+def get():
+    """Proxy metrics in Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
+
 @rt('/add_station')
 def post(name: str, url: str):
     """Add a new station to the database."""
@@ -238,6 +330,7 @@ def post(name: str, url: str):
             'name': name,
             'stream_url': url
         })
+        bump_stations_version()
     except ValueError as e:
         # Return error page instead of redirecting
         return Titled('Error',
@@ -262,11 +355,30 @@ def post(name: str, url: str):
 def delete(station_name: str):
     """Delete a station from the database."""
     stations_table.delete(station_name)
+    bump_stations_version()
     return RedirectResponse('/radio/', status_code=303)
 
 @rt('/')
-def get():
-    all_stations = list(stations_table())
+def get(req):
+    """Serve the cached index page, answering 304 when the ETag matches."""
+    if index_cache['version'] != stations_version:
+        version = stations_version
+        title, body = render_index()
+        html = to_xml(respond(req, [title], body))
+        index_cache.update(version=version, html=html,
+                           etag='"%s"' % hashlib.sha256(html.encode()).hexdigest()[:20])
+
+    etag = index_cache['etag']
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    # nginx gzip weakens ETags to W/"..."; If-None-Match uses weak comparison
+    if_none_match = req.headers.get('if-none-match', '')
+    if etag in (t.strip().removeprefix('W/') for t in if_none_match.split(',')):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(index_cache['html'], headers=headers)
+
+def render_index():
+    # Reachable (or not yet probed) stations first; dead ones sink to the bottom
+    all_stations = sorted(stations_table(), key=is_dead)
 
     # Now playing status
     status_div = Div(
@@ -332,9 +444,14 @@ def get():
         # Always use proxy (handles playlists and HTTP/HTTPS conversion)
         play_url = f'/proxy?url={urllib.parse.quote(station_url)}'
 
+        # Grey out stations the prober could not reach
+        dead = is_dead(station)
+        status = 'Unreachable at last health check' if dead else None
+
         station_list.append(
             Div(
                 Span(f'📻 {station_name}',
+                     title=status,
                      style='font-weight: bold; flex: 1;'),
                 Button('▶️',
                        cls='station-btn',
@@ -349,14 +466,16 @@ def get():
                     style='display: inline; margin: 0;'
                 ),
                 style='display: flex; align-items: center; padding: 12px; margin: 8px 0; border: 1px solid #ddd; border-radius: 5px; background-color: #fff;'
+                      + (' opacity: 0.5;' if dead else '')
             )
         )
 
-    # Random button - convert stations to JSON
+    # Random button - convert stations to JSON, skipping dead ones
+    live_stations = [s for s in all_stations if not is_dead(s)] or all_stations
     random_stations_json = json.dumps([{
         'name': s['name'] if isinstance(s, dict) else s.name,
         'url': s['stream_url'] if isinstance(s, dict) else s.stream_url
-    } for s in all_stations])
+    } for s in live_stations])
 
     random_btn = Button(
         '🎲 Play Random Station',
@@ -381,7 +500,7 @@ def get():
         Div(*station_list),
         custom_input,
         debug_div,
-        Script(audio_js),
+        Script(src=audio_js_path),
         style='max-width: 600px; margin: 0 auto; padding: 20px;'
     )
 
@@ -0,0 +1,87 @@
+"""
+Tiny in-process metrics with Prometheus text exposition.
+Each metric takes at most one label, which keeps the hot-path cost of an
+update to a dict lookup and an add.
+"""
+
+from bisect import bisect_left
+from collections import defaultdict
+
+registry = []
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _series(name, label, label_value, extra=''):
+    labels = []
+    if label is not None:
+        labels.append(f'{label}="{_escape(label_value)}"')
+    if extra:
+        labels.append(extra)
+    return f'{name}{{{",".join(labels)}}}' if labels else name
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, label=None):
+        self.name, self.help, self.label = name, help, label
+        self.values = defaultdict(float)
+        registry.append(self)
+
+    def inc(self, label_value=None, amount=1):
+        self.values[label_value] += amount
+
+    def samples(self):
+        for label_value, value in self.values.items():
+            yield _series(self.name, self.label, label_value), value
+
+class Gauge:
+    """A gauge whose values are computed at scrape time by `collect()`."""
+    kind = 'gauge'
+
+    def __init__(self, name, help, collect, label=None):
+        self.name, self.help, self.label = name, help, label
+        self.collect = collect
+        registry.append(self)
+
+    def samples(self):
+        for label_value, value in self.collect().items():
+            yield _series(self.name, self.label, label_value), value
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets, label=None):
+        self.name, self.help, self.label = name, help, label
+        self.buckets = sorted(buckets)
+        # label value -> [per-bucket counts (+Inf last), sum, count]
+        self.values = defaultdict(lambda: [[0] * (len(self.buckets) + 1), 0.0, 0])
+        registry.append(self)
+
+    def observe(self, value, label_value=None):
+        state = self.values[label_value]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def samples(self):
+        for label_value, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + ['+Inf'], counts):
+                cumulative += n
+                yield _series(f'{self.name}_bucket', self.label, label_value, f'le="{bound}"'), cumulative
+            yield _series(f'{self.name}_sum', self.label, label_value), total
+            yield _series(f'{self.name}_count', self.label, label_value), count
+
+def _format(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def render():
+    """All registered metrics in Prometheus text format (version 0.0.4)."""
+    lines = []
+    for metric in registry:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for series, value in metric.samples():
+            lines.append(f'{series} {_format(value)}')
+    return '\n'.join(lines) + '\n'
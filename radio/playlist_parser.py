@@ -1,49 +1,127 @@
+import asyncio
+import time
 import requests
 import re
+from collections import OrderedDict
+from http_pool import get_client
+
+# How long a resolved playlist stays fresh, in seconds
+PLAYLIST_TTL = 600
+# Past this age a cached answer is no longer served while it refreshes
+PLAYLIST_MAX_AGE = 86400
+# Playlists remembered; /proxy takes any URL, so the least recently used go
+PLAYLIST_CACHE_SIZE = 256
+
+# playlist URL -> (resolved stream URL, time resolved), least recently used first
+_resolved = OrderedDict()
+# playlist URL -> in-flight fetch task
+_inflight = {}
+
+def is_playlist(url):
+    return url.endswith('.pls') or url.endswith('.m3u')
+
+def pick_stream_url(url, content):
+    """
+    Pick the stream URL out of a .pls or .m3u playlist body.
+    Prefers MP3 streams over AAC for better compatibility.
+    Returns None if the playlist has no usable entry.
+    """
+    if url.endswith('.pls'):
+        # PLS format: File1=http://stream.url
+        # Collect all File entries and prefer MP3
+        mp3_urls = []
+        all_urls = []
+
+        for line in content.splitlines():
+            match = re.search(r'File\d+=(.+)', line)
+            if match:
+                stream_url = match.group(1).strip()
+                all_urls.append(stream_url)
+                if '-mp3' in stream_url:
+                    mp3_urls.append(stream_url)
+
+        # Prefer MP3 over AAC (AAC has compatibility issues)
+        if mp3_urls:
+            return mp3_urls[0]
+        elif all_urls:
+            return all_urls[0]
+
+    elif url.endswith('.m3u'):
+        # M3U format: Lines starting with http/https
+        for line in content.splitlines():
+            line = line.strip()
+            if line.startswith('http'):
+                return line
+
+    return None
 
 def parse_playlist_url(url):
     """
     Parse .pls or .m3u playlist files and return direct stream URL.
     If URL is already a direct stream, return as-is.
-    Prefers MP3 streams over AAC for better compatibility.
+    Blocking; async code should use `resolve_playlist_url` instead.
     """
-    if not (url.endswith('.pls') or url.endswith('.m3u')):
+    if not is_playlist(url):
         return url  # Already a direct stream URL
 
     try:
         response = requests.get(url, timeout=10)
-        content = response.text
-
-        if url.endswith('.pls'):
-            # PLS format: File1=http://stream.url
-            # Collect all File entries and prefer MP3
-            mp3_urls = []
-            all_urls = []
-
-            for line in content.splitlines():
-                match = re.search(r'File\d+=(.+)', line)
-                if match:
-                    stream_url = match.group(1).strip()
-                    all_urls.append(stream_url)
-                    if '-mp3' in stream_url:
-                        mp3_urls.append(stream_url)
-
-            # Prefer MP3 over AAC (AAC has compatibility issues)
-            if mp3_urls:
-                return mp3_urls[0]
-            elif all_urls:
-                return all_urls[0]
-
-        elif url.endswith('.m3u'):
-            # M3U format: Lines starting with http/https
-            for line in content.splitlines():
-                line = line.strip()
-                if line.startswith('http'):
-                    return line
-
         # Fallback: return original URL
-        return url
+        return pick_stream_url(url, response.text) or url
 
     except Exception as e:
         print(f"Error parsing playlist {url}: {e}")
         return url  # Return original on error
+
+async def _fetch(url):
+    """Fetch and parse one playlist, caching the result. Never raises."""
+    try:
+        response = await get_client().get(url, timeout=10.0)
+        resolved = pick_stream_url(url, response.text)
+    except Exception as e:
+        print(f"Error parsing playlist {url}: {e}")
+        resolved = None
+
+    if resolved:
+        _resolved[url] = (resolved, time.monotonic())
+        _resolved.move_to_end(url)
+        while len(_resolved) > PLAYLIST_CACHE_SIZE:
+            _resolved.popitem(last=False)
+        return resolved
+    # Keep serving a previous good answer if the refresh failed
+    if url in _resolved:
+        return _resolved[url][0]
+    return url
+
+def _start_fetch(url):
+    task = _inflight.get(url)
+    if task is None:
+        task = _inflight[url] = asyncio.create_task(_fetch(url))
+        task.add_done_callback(lambda t: _inflight.pop(url, None))
+    return task
+
+async def resolve_playlist_url(url):
+    """
+    Async, cached version of `parse_playlist_url`.
+    Fresh entries are returned without any network access. Stale entries
+    are returned immediately while a background refresh runs, up to
+    PLAYLIST_MAX_AGE; older ones are fetched again. Concurrent lookups of
+    the same playlist share one in-flight fetch.
+    """
+    if not is_playlist(url):
+        return url
+
+    cached = _resolved.get(url)
+    if cached is not None:
+        resolved, resolved_at = cached
+        age = time.monotonic() - resolved_at
+        if age > PLAYLIST_MAX_AGE:
+            del _resolved[url]
+        else:
+            _resolved.move_to_end(url)
+            if age > PLAYLIST_TTL:
+                _start_fetch(url)
+            return resolved
+
+    # shield: a cancelled listener must not cancel the shared fetch
+    return await asyncio.shield(_start_fetch(url))
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from fasthtml.common import NotFoundError
+from http_pool import get_client
+from playlist_parser import resolve_playlist_url
+
+# Seconds between probes of a healthy station
+PROBE_INTERVAL = int(os.environ.get('RADIO_PROBE_INTERVAL', 1800))
+# Longest wait between probes of a station that keeps failing
+PROBE_MAX_BACKOFF = 24 * 3600
+PROBE_CONCURRENCY = int(os.environ.get('RADIO_PROBE_CONCURRENCY', 4))
+PROBE_TIMEOUT = 10.0
+# How often the loop looks for stations that are due
+PROBE_TICK = 60
+
+async def probe_station(url):
+    """
+    Open a station's stream and read the first chunk.
+    Returns a dict with reachability, latency to first byte, content type,
+    bitrate and description (the last two from icy-* headers, if sent).
+    """
+    start = time.monotonic()
+    try:
+        stream_url = await resolve_playlist_url(url)
+        async with get_client().stream('GET', stream_url, timeout=PROBE_TIMEOUT) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_raw():
+                if chunk:
+                    break
+            else:
+                raise ValueError('empty stream')
+            latency_ms = int((time.monotonic() - start) * 1000)
+            headers = response.headers
+    except Exception as e:
+        print(f"Probe failed for {url}: {e}")
+        return {'reachable': 0}
+
+    result = {
+        'reachable': 1,
+        'latency_ms': latency_ms,
+        'content_type': headers.get('content-type', '').split(';')[0],
+    }
+    try:
+        result['bitrate'] = int(headers.get('icy-br', '').split(',')[0])
+    except ValueError:
+        pass
+    if headers.get('icy-description'):
+        result['description'] = headers['icy-description'][:200]
+    return result
+
+def _next_check(now, failures):
+    delay = min(PROBE_INTERVAL * 2 ** failures, PROBE_MAX_BACKOFF)
+    return (now + timedelta(seconds=delay)).isoformat()
+
+async def probe_due(stations_table, on_change=None):
+    """
+    Probe every station whose next_check has passed, with bounded concurrency.
+    Calls `on_change` if any station's reachability flipped.
+    """
+    now = datetime.now()
+    due = [s for s in stations_table()
+           if not s.get('next_check') or s['next_check'] <= now.isoformat()]
+    semaphore = asyncio.Semaphore(PROBE_CONCURRENCY)
+
+    async def probe(station):
+        async with semaphore:
+            result = await probe_station(station['stream_url'])
+        failures = 0 if result['reachable'] else (station.get('failures') or 0) + 1
+        try:
+            stations_table.update({
+                'name': station['name'],
+                **result,
+                'failures': failures,
+                'last_checked': datetime.now().isoformat(),
+                'next_check': _next_check(datetime.now(), failures),
+            })
+        except NotFoundError:
+            return False  # Deleted while being probed
+        return result['reachable'] != station.get('reachable')
+
+    changed = await asyncio.gather(*[probe(s) for s in due])
+    if any(changed) and on_change:
+        on_change()
+
+async def run(stations_table, on_change=None):
+    """Background loop: probe due stations every PROBE_TICK seconds."""
+    while True:
+        try:
+            await probe_due(stations_table, on_change)
+        except Exception as e:
+            print(f"Station prober error: {e}")
+        await asyncio.sleep(PROBE_TICK)
+
+_task = None
+
+def start(stations_table, on_change=None):
+    global _task
+    _task = asyncio.create_task(run(stations_table, on_change))
+
+async def stop():
+    if _task is not None:
+        _task.cancel()
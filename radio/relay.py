@@ -0,0 +1,328 @@
+import asyncio
+import os
+import time
+from http_pool import get_client
+from icy import IcyDemuxer
+from metrics import Counter, Gauge, Histogram
+
+# Chunks buffered per listener before backpressure kicks in
+SUBSCRIBER_QUEUE_SIZE = 64
+
+# Upstream reads are coalesced into writes of up to COALESCE_BYTES, flushed
+# at the latest COALESCE_MS after the first pending byte. 0 bytes disables.
+COALESCE_BYTES = int(os.environ.get('RADIO_COALESCE_BYTES', 32 * 1024))
+COALESCE_MS = float(os.environ.get('RADIO_COALESCE_MS', 250))
+
+# What to do with a listener whose queue is full:
+#   'disconnect'  - drop the listener (also once it is MAX_LAG_SECONDS behind)
+#   'drop_oldest' - discard its oldest queued audio and keep it connected
+BACKPRESSURE = os.environ.get('RADIO_BACKPRESSURE', 'disconnect')
+MAX_LAG_SECONDS = float(os.environ.get('RADIO_MAX_LAG_SECONDS', 10))
+# How long a new listener waits for the upstream response headers
+CONNECT_TIMEOUT = 15.0
+DEFAULT_CONTENT_TYPE = 'audio/mpeg'
+
+# Burst-on-connect: recent audio kept per station and sent to new listeners.
+# RADIO_BURST_BYTES fixes the size; otherwise RADIO_BURST_SECONDS is converted
+# using the upstream icy-br bitrate (capped at BURST_MAX_BYTES).
+BURST_SECONDS = float(os.environ.get('RADIO_BURST_SECONDS', 4))
+BURST_BYTES = int(os.environ.get('RADIO_BURST_BYTES', 0))
+BURST_MAX_BYTES = 512 * 1024
+# Total burst memory across all active stations
+BURST_TOTAL_BYTES = int(os.environ.get('RADIO_BURST_TOTAL_BYTES', 8 * 1024 * 1024))
+DEFAULT_BITRATE_KBPS = 128
+
+class RingBuffer:
+    """Fixed-size, preallocated byte ring holding the most recent writes."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buf = bytearray(capacity)
+        self.pos = 0
+        self.full = False
+
+    def write(self, data):
+        view = memoryview(data)
+        if len(view) >= self.capacity:
+            self.buf[:] = view[-self.capacity:]
+            self.pos = 0
+            self.full = True
+            return
+        end = self.pos + len(view)
+        if end <= self.capacity:
+            self.buf[self.pos:end] = view
+        else:
+            split = self.capacity - self.pos
+            self.buf[self.pos:] = view[:split]
+            self.buf[:end - self.capacity] = view[split:]
+        if end >= self.capacity:
+            self.full = True
+        self.pos = end % self.capacity
+
+    def snapshot(self):
+        """Return the buffered bytes, oldest first."""
+        if not self.full:
+            return bytes(self.buf[:self.pos])
+        return bytes(self.buf[self.pos:]) + bytes(self.buf[:self.pos])
+
+_burst_in_use = 0
+
+def _alloc_burst(headers):
+    """Allocate a burst buffer for a station, or None if over budget."""
+    global _burst_in_use
+    if BURST_BYTES:
+        size = BURST_BYTES
+    else:
+        try:
+            kbps = int(headers.get('icy-br', '').split(',')[0])
+        except ValueError:
+            kbps = DEFAULT_BITRATE_KBPS
+        size = min(int(BURST_SECONDS * kbps * 125), BURST_MAX_BYTES)
+    if size <= 0 or _burst_in_use + size > BURST_TOTAL_BYTES:
+        return None
+    _burst_in_use += size
+    return RingBuffer(size)
+
+def _free_burst(ring):
+    global _burst_in_use
+    if ring is not None:
+        _burst_in_use -= ring.capacity
+
+# Gap between upstream chunks above which we count a stall
+STALL_SECONDS = 2.0
+
+# Per-station series are labelled with the station's name, and streams
+# that are not in the station list share OTHER_LABEL, so the number of
+# series stays bounded however many URLs are played through /proxy
+OTHER_LABEL = 'other'
+
+def _listener_counts():
+    counts = {}
+    for relay in relays.values():
+        counts[relay.label] = counts.get(relay.label, 0) + len(relay.subscribers)
+    return counts
+
+LISTENERS = Gauge('radio_listeners', 'Active listeners per station', _listener_counts, label='station')
+UPSTREAM_BYTES = Counter('radio_upstream_bytes_total', 'Bytes read from upstream', label='station')
+RELAYED_BYTES = Counter('radio_relayed_bytes_total', 'Audio bytes queued to listeners', label='station')
+UPSTREAM_TTFB = Histogram('radio_upstream_ttfb_seconds', 'Upstream time to first byte',
+                          [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10])
+CHUNK_GAP = Histogram('radio_upstream_chunk_gap_seconds', 'Time between upstream chunks',
+                      [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5])
+STALLS = Counter('radio_upstream_stalls_total', f'Upstream gaps longer than {STALL_SECONDS:g}s', label='station')
+DISCONNECTS = Counter('radio_disconnects_total', 'Listener disconnects by reason', label='reason')
+DROPPED_BYTES = Counter('radio_dropped_bytes_total', 'Audio discarded for slow listeners (drop_oldest)', label='station')
+SEND_TIME = Histogram('radio_listener_send_seconds', 'Time to hand one chunk to a listener connection',
+                      [0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5])
+
+class StationRelay:
+    """
+    Fan out one upstream stream to many listeners.
+    The first subscriber starts the upstream reader, later subscribers
+    attach to it, and the reader is cancelled when the last one leaves.
+    Upstream reads are coalesced into larger writes (COALESCE_BYTES within
+    COALESCE_MS). Each subscriber gets a bounded queue of (enqueued at, chunk);
+    a listener that falls behind gets the BACKPRESSURE policy instead of
+    stalling everyone else.
+    ICY metadata is requested upstream, stripped before fan-out, and the
+    current track published as `title`.
+    """
+
+    def __init__(self, url, on_close=None, label=OTHER_LABEL):
+        self.url = url
+        self.label = label
+        self.on_close = on_close
+        self.subscribers = set()
+        self.task = None
+        self.burst = None
+        self.ready = asyncio.Event()
+        self.content_type = DEFAULT_CONTENT_TYPE
+        self.title = None
+        self.pending = []
+        self.pending_bytes = 0
+        self.flush_timer = None
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        # Start new listeners with the last few seconds of audio
+        if self.burst is not None:
+            backlog = self.burst.snapshot()
+            if backlog:
+                queue.put_nowait((time.monotonic(), backlog))
+                RELAYED_BYTES.inc(self.label, len(backlog))
+        self.subscribers.add(queue)
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers:
+            self.close()
+
+    def close(self):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+        if self.on_close:
+            self.on_close(self)
+
+    def _push(self, chunk):
+        """Queue audio for coalescing; flush on size or when the budget expires."""
+        self.pending.append(chunk)
+        self.pending_bytes += len(chunk)
+        if self.pending_bytes >= COALESCE_BYTES:
+            self._flush()
+        elif self.flush_timer is None:
+            self.flush_timer = asyncio.get_running_loop().call_later(COALESCE_MS / 1000, self._flush)
+
+    def _flush(self):
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        if not self.pending:
+            return
+        chunk = self.pending[0] if len(self.pending) == 1 else b''.join(self.pending)
+        self.pending.clear()
+        self.pending_bytes = 0
+        self._broadcast(chunk)
+
+    def _broadcast(self, chunk):
+        if self.burst is not None:
+            self.burst.write(chunk)
+        RELAYED_BYTES.inc(self.label, len(chunk) * len(self.subscribers))
+        item = (time.monotonic(), chunk)
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(item)
+            except asyncio.QueueFull:
+                if BACKPRESSURE == 'drop_oldest':
+                    DROPPED_BYTES.inc(self.label, len(queue.get_nowait()[1]))
+                    queue.put_nowait(item)
+                else:
+                    # Slow listener: drop it and tell its generator to stop
+                    DISCONNECTS.inc('slow_client')
+                    self._end(queue)
+                    self.subscribers.discard(queue)
+        if not self.subscribers:
+            self.close()
+
+    @staticmethod
+    def _end(queue):
+        """Push the end-of-stream marker, discarding buffered audio if needed."""
+        while True:
+            try:
+                queue.put_nowait(None)
+                return
+            except asyncio.QueueFull:
+                queue.get_nowait()
+
+    def _set_title(self, title):
+        self.title = title
+
+    async def _run(self):
+        end_reason = 'upstream_eof'
+        try:
+            headers = {'Icy-MetaData': '1'}
+            started = time.monotonic()
+            async with get_client().stream('GET', self.url, headers=headers) as response:
+                response.raise_for_status()
+                self.content_type = response.headers.get('content-type', DEFAULT_CONTENT_TYPE)
+                self.burst = _alloc_burst(response.headers)
+                self.ready.set()
+
+                metaint = int(response.headers.get('icy-metaint') or 0)
+                demux = IcyDemuxer(metaint, on_title=self._set_title) if metaint else None
+                last = None
+                async for chunk in response.aiter_bytes():
+                    now = time.monotonic()
+                    if last is None:
+                        UPSTREAM_TTFB.observe(now - started)
+                    else:
+                        CHUNK_GAP.observe(now - last)
+                        if now - last > STALL_SECONDS:
+                            STALLS.inc(self.label)
+                    last = now
+                    UPSTREAM_BYTES.inc(self.label, len(chunk))
+
+                    if demux is not None:
+                        chunk = demux.feed(chunk)
+                    if chunk:
+                        self._push(chunk)
+                self._flush()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            end_reason = 'upstream_error'
+            print(f"Relay error for {self.url}: {e}")
+        finally:
+            if self.flush_timer is not None:
+                self.flush_timer.cancel()
+                self.flush_timer = None
+            self.ready.set()
+            for queue in self.subscribers:
+                DISCONNECTS.inc(end_reason)
+                self._end(queue)
+            self.subscribers.clear()
+            _free_burst(self.burst)
+            self.burst = None
+            if self.on_close:
+                self.on_close(self)
+
+# Active relays, keyed by resolved stream URL
+relays = {}
+
+def _forget(relay):
+    if relays.get(relay.url) is relay:
+        del relays[relay.url]
+
+def get_relay(url, label=OTHER_LABEL):
+    """Return the running relay for `url`, creating one (metrics labelled `label`) if needed."""
+    relay = relays.get(url)
+    if relay is None:
+        relay = relays[url] = StationRelay(url, on_close=_forget, label=label)
+    return relay
+
+def now_playing(url):
+    """Current ICY track title for a relayed stream URL, or None."""
+    relay = relays.get(url)
+    return relay.title if relay else None
+
+async def open_listener(url, label=OTHER_LABEL):
+    """
+    Join the relay for `url` and wait for the upstream headers; `label`
+    names the station in metrics. Returns (content type, async generator
+    yielding the audio).
+    """
+    relay = get_relay(url, label)
+    queue = relay.subscribe()
+    try:
+        await asyncio.wait_for(relay.ready.wait(), CONNECT_TIMEOUT)
+    except BaseException as e:
+        if isinstance(e, asyncio.TimeoutError):
+            DISCONNECTS.inc('connect_timeout')
+        relay.unsubscribe(queue)
+        raise
+    return relay.content_type, _drain(relay, queue)
+
+async def _drain(relay, queue):
+    ended_by_relay = False
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                ended_by_relay = True
+                break
+            queued_at, chunk = item
+            start = time.monotonic()
+            if BACKPRESSURE == 'disconnect' and start - queued_at > MAX_LAG_SECONDS:
+                DISCONNECTS.inc('slow_client')
+                ended_by_relay = True
+                break
+            # The response awaits the socket send before asking for more,
+            # so the time spent in yield is this listener's drain time
+            yield chunk
+            SEND_TIME.observe(time.monotonic() - start)
+    finally:
+        if not ended_by_relay:
+            DISCONNECTS.inc('client_gone')
+        relay.unsubscribe(queue)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Concurrent stream-variant scanner.
+
+Probes many stream URLs at once (bounded overall and per host), prints
+results as they finish, and writes a JSON/CSV report ranking variants:
+MP3 first (as pick_stream_url prefers it for compatibility), then by time
+to first byte and throughput. --update-stations points existing presets
+at their best variant; --add-new also adds groups with no preset.
+
+    python scanner.py somafm -o somafm.json           # SomaFM variant matrix
+    python scanner.py file stations.txt -o report.csv # every preset
+    python scanner.py somafm --update-stations stations.txt
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import re
+import sys
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+import httpx
+from playlist_parser import is_playlist, pick_stream_url
+
+SOMAFM_STATIONS = [
+    'groovesalad',
+    'dronezone',
+    'deepspaceone',
+    'secretagent',
+    'lush'
+]
+ICE_SERVERS = ['ice2', 'ice4', 'ice6']
+PROTOCOLS = ['http', 'https']
+FORMATS = [
+    ('256-mp3', 'MP3 256k'),
+    ('128-mp3', 'MP3 128k'),
+    ('128-aac', 'AAC 128k'),
+    ('64-aacp', 'AAC+ 64k')
+]
+
+REPORT_FIELDS = ['group', 'name', 'url', 'ok', 'status', 'content_type',
+                 'ttfb_ms', 'throughput_kbps', 'bytes', 'error']
+
+def somafm_variants(stations=SOMAFM_STATIONS):
+    """Every protocol x ice server x format combination for each station."""
+    variants = []
+    for station in stations:
+        for protocol in PROTOCOLS:
+            for ice in ICE_SERVERS:
+                for fmt_code, fmt_name in FORMATS:
+                    variants.append({
+                        'group': f'soma {station}',
+                        'name': f'{protocol.upper()} {ice} {fmt_name}',
+                        'url': f'{protocol}://{ice}.somafm.com/{station}-{fmt_code}',
+                    })
+    return variants
+
+def file_variants(path):
+    """One variant per preset in a stations.txt-style JSON file."""
+    with open(path) as f:
+        stations = json.load(f)
+    return [{'group': name, 'name': name, 'url': url} for name, url in stations.items()]
+
+async def probe(client, variant, timeout, sample_seconds):
+    """Measure time to first byte and throughput over `sample_seconds`."""
+    result = {**variant, 'ok': False, 'status': None, 'content_type': None,
+              'ttfb_ms': None, 'throughput_kbps': None, 'bytes': 0, 'error': None}
+    url = variant['url']
+    start = time.monotonic()
+    try:
+        if is_playlist(url):
+            response = await client.get(url, timeout=timeout)
+            url = pick_stream_url(url, response.text) or url
+        async with client.stream('GET', url, timeout=timeout) as response:
+            result['status'] = response.status_code
+            result['content_type'] = response.headers.get('content-type', '').split(';')[0]
+            if response.status_code != 200:
+                return result
+            first_byte = None
+            async for chunk in response.aiter_raw():
+                now = time.monotonic()
+                if first_byte is None:
+                    first_byte = now
+                result['bytes'] += len(chunk)
+                if now - first_byte >= sample_seconds:
+                    break
+            if first_byte is None:
+                result['error'] = 'empty response'
+                return result
+            elapsed = max(time.monotonic() - first_byte, 1e-3)
+            result['ok'] = True
+            result['ttfb_ms'] = round((first_byte - start) * 1000, 1)
+            result['throughput_kbps'] = round(result['bytes'] * 8 / elapsed / 1000, 1)
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'[:120]
+    return result
+
+async def scan(variants, concurrency=20, per_host=2, timeout=5.0, sample_seconds=2.0):
+    """
+    Async generator yielding one result dict per variant, in completion order.
+    At most `concurrency` probes run at once, and at most `per_host` against
+    any single host.
+    """
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    overall = asyncio.Semaphore(concurrency)
+    hosts = defaultdict(lambda: asyncio.Semaphore(per_host))
+
+    async with httpx.AsyncClient(limits=limits, follow_redirects=True) as client:
+        async def bounded(variant):
+            async with hosts[urlsplit(variant['url']).hostname], overall:
+                return await probe(client, variant, timeout, sample_seconds)
+
+        for next_result in asyncio.as_completed([bounded(v) for v in variants]):
+            yield await next_result
+
+def is_mp3(result):
+    return result['content_type'] == 'audio/mpeg' or '-mp3' in result['url']
+
+def rank(results):
+    """Working variants first, MP3 before other formats, then fastest first
+    byte and highest throughput."""
+    return sorted(results, key=lambda r: (not r['ok'], not is_mp3(r), r['ttfb_ms'] or 0,
+                                          -(r['throughput_kbps'] or 0)))
+
+def best_by_group(results):
+    """Map each group to the URL of its best-ranked working variant."""
+    best = {}
+    for r in rank(results):
+        if r['ok'] and r['group'] not in best:
+            best[r['group']] = r['url']
+    return best
+
+def write_report(results, path):
+    """Write ranked results as CSV if `path` ends in .csv, else JSON."""
+    ranked = rank(results)
+    with open(path, 'w', newline='') as f:
+        if path.endswith('.csv'):
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(ranked)
+        else:
+            json.dump(ranked, f, indent=2)
+
+def preset_for(stations, group):
+    """
+    The preset a scanned group updates: the one with the group's name, or
+    for a SomaFM group, the preset already playing that channel (e.g.
+    'soma secretagent' is 'soma spies' at somafm.com/secretagent.pls).
+    """
+    if group in stations:
+        return group
+    if group.startswith('soma '):
+        channel = re.escape(group[len('soma '):])
+        for name, url in stations.items():
+            parts = urlsplit(url)
+            if (parts.hostname or '').endswith('somafm.com') and re.match(rf'/{channel}(\d*)([.-]|$)', parts.path):
+                return name
+    return None
+
+def update_stations(path, best, add_new=False):
+    """
+    Point existing presets at their best measured variant; groups without
+    a preset are added under their group name only with `add_new`.
+    Returns (presets updated, groups added).
+    """
+    with open(path) as f:
+        stations = json.load(f)
+    updated = added = 0
+    for group, url in best.items():
+        name = preset_for(stations, group)
+        if name is not None:
+            stations[name] = url
+            updated += 1
+        elif add_new:
+            stations[group] = url
+            added += 1
+    with open(path, 'w') as f:
+        json.dump(dict(sorted(stations.items())), f, indent=2)
+        f.write('\n')
+    return updated, added
+
+def print_result(r):
+    label = f"{r['group']} | {r['name']}" if r['group'] != r['name'] else r['name']
+    if r['ok']:
+        print(f"✓ {label:45} | {r['content_type']:20} | {r['ttfb_ms']:7.1f} ms | {r['throughput_kbps']:7.1f} kbps")
+    else:
+        print(f"✗ {label:45} | {r['error'] or 'Status: %s' % r['status']}")
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description='Scan radio stream variants concurrently.')
+    parser.add_argument('source', choices=['somafm', 'file'], help='variant matrix to scan')
+    parser.add_argument('path', nargs='?', default='stations.txt', help='stations file for `file`')
+    parser.add_argument('--stations', nargs='+', default=SOMAFM_STATIONS, help='SomaFM stations for `somafm`')
+    parser.add_argument('-c', '--concurrency', type=int, default=20)
+    parser.add_argument('--per-host', type=int, default=2, help='max concurrent probes per host')
+    parser.add_argument('--timeout', type=float, default=5.0)
+    parser.add_argument('--sample', type=float, default=2.0, help='seconds of audio read for throughput')
+    parser.add_argument('-o', '--output', help='report file (.json or .csv)')
+    parser.add_argument('--update-stations', metavar='PATH', help='write best variant per group into a stations file')
+    parser.add_argument('--add-new', action='store_true', help='with --update-stations, add groups that have no preset')
+    args = parser.parse_args(argv)
+
+    variants = somafm_variants(args.stations) if args.source == 'somafm' else file_variants(args.path)
+    print(f"Scanning {len(variants)} variants (concurrency {args.concurrency}, {args.per_host} per host)")
+
+    start = time.monotonic()
+    results = []
+    async for result in scan(variants, args.concurrency, args.per_host, args.timeout, args.sample):
+        print_result(result)
+        results.append(result)
+
+    working = sum(r['ok'] for r in results)
+    print(f"\n{working}/{len(results)} working in {time.monotonic() - start:.1f} s")
+
+    if args.output:
+        write_report(results, args.output)
+        print(f"Report written to {args.output}")
+    if args.update_stations:
+        updated, added = update_stations(args.update_stations, best_by_group(results), args.add_new)
+        print(f"Updated {updated} presets in {args.update_stations}" + (f", added {added}" if added else ''))
+    return 0 if working else 1
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))